@@ -0,0 +1,199 @@
+import numpy as np
+import components
+from dyads import solve_dyads
+
+
+def _rank(matrix):
+    if matrix.size == 0:
+        return 0
+    singular = np.linalg.svd(matrix, compute_uv=False)
+    return int(np.count_nonzero(singular > 1e-9 * max(singular.max(initial=0.0), 1.0)))
+
+
+def _dependent_rows(matrix):
+    """ Maske der Zeilen, die den Rang der vorangehenden Zeilen nicht erhöhen.
+
+    Bei der QR-Zerlegung von matrix^T ohne Pivotisierung zeigt sich das als verschwindendes Diagonalelement.
+    """
+    diagonal = np.abs(np.diag(np.linalg.qr(matrix.T, mode="r")))
+    diagonal = np.concatenate([diagonal, np.zeros(len(matrix) - len(diagonal))])
+    return diagonal <= 1e-9 * max(diagonal.max(initial=0.0), 1.0)
+
+
+def structure_report(mechanism):
+    """ Prüft den Stabgraphen in der Ausgangsstellung, ohne zu simulieren.
+
+    Zählt die Freiheitsgrade nach Grübler (2 je beweglichem Gelenk minus 1 je Stab, die
+    Kurbel ist angetrieben) und über den Rang der Jacobi-Matrix, der auch geometrisch
+    abhängige Stäbe erkennt. Gibt ein Dict mit Kennzahlen sowie den Listen problems
+    (Simulation sinnlos) und warnings (Simulation möglich) zurück.
+
+    Ein überzähliger Stab ist nur redundant, wenn er auch bei drehender Kurbel nichts
+    Neues fordert. Verhindert er die Kurbeldrehung in der Ausgangsstellung, steht er in
+    locking_rods; ob die Kurbel tatsächlich blockiert ist (und nicht nur in einer Totlage
+    steht), entscheidet erst der Umlauf in analyze_mechanism.
+    """
+    joint_ids = mechanism.joint_ids
+    known = {j for j, moving in zip(joint_ids, mechanism.moving_mask) if not moving}
+    problems, warnings = [], []
+
+    invalid_rods = [(j1, j2) for j1, j2 in mechanism.rods if j1 == j2]
+    for j1, j2 in invalid_rods:
+        problems.append(f"Stab {j1}-{j2} verbindet ein Gelenk mit sich selbst.")
+
+    seen, duplicate_rods = set(), []
+    for j1, j2 in mechanism.rods:
+        pair = frozenset((j1, j2))
+        if j1 != j2 and pair in seen:
+            duplicate_rods.append((j1, j2))
+        seen.add(pair)
+
+    # Erreichbarkeit vom Gestell und der Kurbel aus
+    neighbours = {j: set() for j in joint_ids}
+    for j1, j2 in mechanism.rods:
+        neighbours[j1].add(j2)
+        neighbours[j2].add(j1)
+    reached, queue = set(known), list(known)
+    while queue:
+        for n in neighbours[queue.pop()] - reached:
+            reached.add(n)
+            queue.append(n)
+    disconnected_joints = [j for j in joint_ids if j not in reached]
+    for j in disconnected_joints:
+        problems.append(f"Gelenk {j} ist weder mit dem Gestell noch mit der Kurbel verbunden.")
+
+    # Stäbe zwischen bekannten Gelenken dürfen ihre Länge beim Drehen der Kurbel nicht ändern
+    crank_distance = {j: np.linalg.norm(mechanism.positions[mechanism.joint_index[j]] - mechanism.fixed_point) for j in known}
+    blocking_rods = [(j1, j2) for j1, j2 in mechanism.rods if j1 != j2 and {j1, j2} <= known and 2 in (j1, j2)
+                     and not np.isclose(crank_distance[j1 if j2 == 2 else j2], 0.0, atol=1e-9)]
+    for j1, j2 in blocking_rods:
+        problems.append(f"Stab {j1}-{j2} verbindet die Kurbel mit einem festen Gelenk außerhalb des Drehpunkts und blockiert sie.")
+
+    constraint_rows = [i for i, (a, b) in enumerate(mechanism.rod_index)
+                       if a != b and (mechanism.moving_mask[a] or mechanism.moving_mask[b])]
+    unknowns = 2 * len(mechanism.moving_joints)
+    gruebler = unknowns - len(constraint_rows)
+
+    positions = mechanism.joint_positions()
+    jacobian = mechanism.rod_jacobian(positions[mechanism.moving_mask].ravel(), positions.copy())[constraint_rows]
+    rank = _rank(jacobian)
+    dof = unknowns - rank
+
+    # Ein Stab ist redundant, wenn seine Zeile den Rang der bisherigen nicht erhöht, auch mit der
+    # Kurbeldrehung als zusätzlicher Spalte. Abhängig nur ohne diese Spalte heißt: er hält die Kurbel fest.
+    redundant_rods, locking_rods = [], []
+    if constraint_rows and unknowns:
+        crank_columns = np.full(len(joint_ids), -1)
+        crank_columns[mechanism.crank] = 0
+        arm = positions[mechanism.crank] - mechanism.fixed_point
+        tangent = np.array([-arm[1], arm[0]]) / max(np.hypot(*arm), 1e-12)
+        crank_motion = components.rod_jacobian(positions, mechanism.rod_index, crank_columns, 2)[constraint_rows] @ tangent
+        dependent = _dependent_rows(np.column_stack([jacobian, crank_motion]))
+        dependent_without_crank = _dependent_rows(jacobian)
+        redundant_rods = [tuple(mechanism.rods[i]) for i, d in zip(constraint_rows, dependent) if d]
+        locking_rods = [tuple(mechanism.rods[i]) for i, d, f in zip(constraint_rows, dependent, dependent_without_crank) if f and not d]
+
+    free_joints = []
+    if dof > 0:
+        null_space = np.linalg.svd(jacobian if jacobian.size else np.zeros((1, unknowns)))[2][rank:]
+        motion = np.linalg.norm(null_space.reshape(len(null_space), -1, 2), axis=(0, 2))
+        free_joints = [j for j, m in zip(mechanism.moving_joints, motion) if m > 1e-6]
+    # Nicht verbundene Gelenke sind oben schon gemeldet
+    if [j for j in free_joints if j not in disconnected_joints]:
+        problems.append(f"Unterbestimmt: {dof} Freiheitsgrad(e) zusätzlich zur Kurbel, frei beweglich: "
+                        f"Gelenke {', '.join(map(str, free_joints))}.")
+    if redundant_rods:
+        warnings.append(f"Überbestimmt: Stäbe {', '.join(f'{j1}-{j2}' for j1, j2 in redundant_rods)} sind redundant "
+                        f"und werden nur über den Ausgleichslöser erfüllt.")
+
+    return {
+        "gruebler": gruebler, "rank": rank, "dof": dof, "redundant_rods": redundant_rods, "locking_rods": locking_rods,
+        "duplicate_rods": duplicate_rods, "invalid_rods": invalid_rods, "blocking_rods": blocking_rods,
+        "disconnected_joints": disconnected_joints, "free_joints": free_joints,
+        "problems": problems, "warnings": warnings,
+    }
+
+
+def feasible_crank_angles(mechanism, samples=360):
+    """ Grober Umlauf ohne Darstellung: in welchen Kurbelstellungen lässt sich der Mechanismus montieren?
+
+    Zerlegbare Mechanismen werden nur über die Dyaden geprüft, sonst über solve_position.
+    Die Winkel beginnen einen Schritt nach der Ausgangsstellung wie bei cycle_angles; der
+    letzte ist die Ausgangsstellung nach einer vollen Umdrehung, die immer schließt.
+    Gibt (Winkel in Grad, Maske der montierbaren Stellungen) zurück.
+    """
+    angles = mechanism.theta + 2 * np.pi * np.arange(1, samples + 1) / samples
+    feasible = np.zeros(samples, dtype=bool)
+    start_theta, start_positions = mechanism.theta, mechanism.joint_positions()
+    start_verbose, start_last_solve = mechanism.verbose, mechanism.last_solve
+    mechanism.verbose = False
+
+    positions = mechanism.joint_positions()
+    last_solved = mechanism.joint_positions()
+    crank = mechanism.crank
+    for i, theta in enumerate(angles):
+        mechanism.theta = theta
+        if mechanism.unresolved_joints:
+            mechanism.positions[crank] = mechanism.compute_gelenk_2()
+            feasible[i] = mechanism.solve_position() is not None
+            if feasible[i]:
+                last_solved[:] = mechanism.positions
+            else:
+                mechanism.positions[:] = last_solved
+            continue
+        trial = positions.copy()
+        trial[crank] = mechanism.compute_gelenk_2()
+        if solve_dyads(mechanism.dyad_plan, trial):
+            feasible[i] = np.abs(mechanism.current_lengths(trial) - mechanism.rod_lengths).max(initial=0.0) <= 1e-5
+            positions = trial
+
+    mechanism.theta, mechanism.positions[:] = start_theta, start_positions
+    mechanism.verbose, mechanism.last_solve = start_verbose, start_last_solve
+    return np.degrees(angles), feasible
+
+
+def feasible_intervals(angles, feasible):
+    """ Fasst die Maske zu zusammenhängenden Winkelbereichen (Start, Ende) in Grad zusammen, auch über 360° hinweg. """
+    if feasible.all():
+        return [(float(angles[0]), float(angles[0] + 360.0))]
+    step = 360.0 / len(angles)
+    # Beginn bei einer nicht montierbaren Stellung, damit kein Bereich über das Array-Ende läuft
+    order = np.roll(np.arange(len(angles)), -int(np.flatnonzero(~feasible)[0]))
+    intervals, start = [], None
+    for position, k in enumerate(np.append(order, order[0])):
+        if feasible[k] and start is None:
+            start = position
+        elif not feasible[k] and start is not None:
+            first = float(angles[order[start]] % 360.0)
+            intervals.append((first, first + (position - 1 - start) * step))
+            start = None
+    return intervals
+
+
+def analyze_mechanism(mechanism, samples=None):
+    """ Vollständige Vorabprüfung: Struktur und montierbare Kurbelwinkel. Gibt ein Dict wie structure_report zurück.
+
+    Ohne samples wird bei reinen Dyaden-Mechanismen in 1°-Schritten geprüft, sonst in 5°-Schritten,
+    weil jede Stellung dann Teilsysteme lösen muss.
+    """
+    if samples is None:
+        samples = 72 if mechanism.unresolved_joints else 360
+    report = structure_report(mechanism)
+    if report["invalid_rods"] or report["disconnected_joints"] or report["blocking_rods"]:
+        report.update({"feasible_fraction": 0.0, "feasible_intervals": []})
+        return report
+
+    angles, feasible = feasible_crank_angles(mechanism, samples)
+    report["feasible_fraction"] = float(feasible.mean())
+    report["feasible_intervals"] = feasible_intervals(angles, feasible)
+    if not feasible.any():
+        report["problems"].append("Der Mechanismus lässt sich in keiner Kurbelstellung montieren.")
+    elif not feasible[:-1].any():
+        # Nur die eingegebene Stellung schließt, die Kurbel lässt sich nicht drehen
+        locking = ", ".join(f"{j1}-{j2}" for j1, j2 in report["locking_rods"])
+        report["problems"].append("Die Kurbel ist blockiert, montierbar ist nur die Ausgangsstellung"
+                                  + (f" (Stäbe {locking} halten sie fest)." if locking else "."))
+    elif not feasible.all():
+        ranges = ", ".join(f"{start:.0f}°–{end % 360:.0f}°" for start, end in report["feasible_intervals"])
+        report["warnings"].append(f"Nur {feasible.mean():.0%} der Umdrehung montierbar: {ranges}.")
+    return report
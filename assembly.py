@@ -0,0 +1,155 @@
+import numpy as np
+
+
+def walker_legs(count, mirror=False, spacing=0.0):
+    """ Beinanordnung eines Laufmechanismus: count Beine mit gleichmäßig verteilter Phase auf einer Kurbelwelle.
+
+    Mit mirror bekommt jedes Bein ein an der Kurbelachse gespiegeltes Gegenstück mit
+    derselben Kurbelstellung. spacing verschiebt aufeinanderfolgende Beine in X, damit
+    sie sich in der Darstellung nicht überdecken.
+    """
+    legs = []
+    for i in range(count):
+        offset = (i * spacing, 0.0)
+        legs.append({"phase": 360.0 * i / count, "mirror": False, "offset": offset})
+        if mirror:
+            legs.append({"phase": 360.0 * i / count, "mirror": True, "offset": offset})
+    return legs
+
+
+class LegAssembly:
+    """ Mehrere gleiche Beine an einer gemeinsamen Kurbelwelle, definiert durch einen Mechanismus als Vorlage.
+
+    Jedes Bein ist ein Dict mit phase (Kurbelversatz in Grad), mirror (Spiegelung an der
+    Senkrechten durch den Kurbeldrehpunkt) und offset (Verschiebung (dx, dy)). Gelöst wird
+    nur eine Umdrehung der Vorlage; die Bahnen aller Beine entstehen daraus durch
+    Umsortieren der Frames und die Transformation, kosten also fast nichts zusätzlich.
+    Phasen werden dabei auf das Frameraster gerundet.
+
+    Die Baugruppe bietet die Schnittstelle, die Darstellung und Export von einem
+    Mechanismus nutzen (joint_ids, rods, rod_index, show_trajectory, solve_cycle,
+    cycle_derivatives). Gelenk j von Bein l hat die ID l * id_stride + j, Bein 0 behält
+    also die Gelenk-IDs der Vorlage.
+    """
+
+    def __init__(self, template, legs):
+        if not legs:
+            raise ValueError("Die Baugruppe braucht mindestens ein Bein.")
+        self.template = template
+        self.legs = [{"phase": float(leg.get("phase", 0.0)), "mirror": bool(leg.get("mirror", False)),
+                      "offset": tuple(float(v) for v in leg.get("offset", (0.0, 0.0)))} for leg in legs]
+        self.id_stride = 10 ** len(str(max(template.joint_ids)))
+
+        count = len(template.joint_ids)
+        self.joint_ids = [l * self.id_stride + j for l in range(len(self.legs)) for j in template.joint_ids]
+        self.rods = [(l * self.id_stride + j1, l * self.id_stride + j2) for l in range(len(self.legs)) for j1, j2 in template.rods]
+        self.rod_index = np.concatenate([template.rod_index + l * count for l in range(len(self.legs))])
+        self.show_trajectory = {l * self.id_stride + j: shown for l in range(len(self.legs))
+                                for j, shown in getattr(template, "show_trajectory", {}).items()}
+
+    @property
+    def verbose(self):
+        return self.template.verbose
+
+    @verbose.setter
+    def verbose(self, value):
+        self.template.verbose = value
+
+    def cycle_steps(self, steps=None):
+        """ Framezahl einer Umdrehung. Ohne steps aus der Geschwindigkeit der Vorlage, aber immer als volle Umdrehung,
+        damit das Frameraster periodisch ist und sich um ganze Frames verschieben lässt. """
+        if steps is None:
+            steps = int(np.ceil(2 * np.pi / self.template.speed - 1e-9))
+        return steps
+
+    def cycle_angles(self, steps=None):
+        """ Winkel der Kurbelwelle aller Frames, gleich denen der Vorlage. """
+        return self.template.cycle_angles(self.cycle_steps(steps))
+
+    def frame_indices(self, steps):
+        """ Für jedes Bein der Frame der Vorlage, der zu jedem Frame der Baugruppe gehört, (Beine x Frames).
+
+        Frame f der Vorlage liegt bei theta0 + 2π(f+1)/steps. Ein gespiegeltes Bein sieht die
+        Kurbel unter dem Winkel π - Wellenwinkel, durchläuft den Zyklus der Vorlage also rückwärts.
+        """
+        frames = np.arange(steps)
+        step = 2 * np.pi / steps
+        indices = []
+        for leg in self.legs:
+            phase = np.radians(leg["phase"])
+            if leg["mirror"]:
+                shift = int(round((np.pi - 2 * self.template.theta - phase) / step)) - 2
+                indices.append((shift - frames) % steps)
+            else:
+                indices.append((frames + int(round(phase / step))) % steps)
+        return np.array(indices, dtype=int).reshape(len(self.legs), steps)
+
+    def _transform(self, leg, points):
+        """ Spiegelt und verschiebt Punkte (... x 2) eines Beins aus dem Koordinatensystem der Vorlage. """
+        points = points.copy()
+        if leg["mirror"]:
+            points[..., 0] = 2 * self.template.fixed_point[0] - points[..., 0]
+        return points + np.asarray(leg["offset"])
+
+    def assemble(self, positions, residuals, failures):
+        """ Setzt aus einem Zyklus der Vorlage ((Frames x Gelenke x 2), ...) den Zyklus der Baugruppe zusammen.
+
+        Ein Frame gilt als fehlgeschlagen, sobald eines der Beine in seiner Stellung nicht lösbar ist.
+        """
+        indices = self.frame_indices(len(positions))
+        legs = [self._transform(leg, positions[index]) for leg, index in zip(self.legs, indices)]
+        assembled = np.concatenate(legs, axis=1)
+        assembled_failures = failures[indices].any(axis=0)
+        assembled[assembled_failures] = np.nan
+        assembled_residuals = np.where(assembled_failures, np.nan, residuals[indices].max(axis=0))
+        return assembled, assembled_residuals, assembled_failures
+
+    def template_cycle(self, positions):
+        """ Gewinnt den Zyklus der Vorlage aus einer zusammengesetzten Lösung zurück.
+
+        Jeder Frame der Vorlage wird aus dem Bein übernommen, bei dem er in einem gelösten
+        Frame der Baugruppe vorkommt; nirgends benötigte Frames bleiben NaN.
+        """
+        count = len(self.template.joint_ids)
+        template = np.full((len(positions), count, 2), np.nan)
+        for l, (leg, index) in enumerate(zip(self.legs, self.frame_indices(len(positions)))):
+            block = positions[:, l * count:(l + 1) * count] - np.asarray(leg["offset"])
+            if leg["mirror"]:
+                block[..., 0] = 2 * self.template.fixed_point[0] - block[..., 0]
+            solved = ~np.isnan(block).any(axis=(1, 2))
+            template[index[solved]] = block[solved]
+        return template
+
+    def solve_cycle(self, steps=None, trace=None):
+        """ Wie Mechanism.solve_cycle, gelöst wird aber nur die Vorlage. Gibt (positions, residuals, failures) mit allen Beinen zurück. """
+        return self.assemble(*self.template.solve_cycle(self.cycle_steps(steps), trace))
+
+    def solve_cycle_adaptive(self, steps=None, trace=None):
+        """ Wie Mechanism.solve_cycle_adaptive für die Vorlage, zusammengesetzt auf alle Beine. """
+        return self.assemble(*self.template.solve_cycle_adaptive(self.cycle_steps(steps), trace=trace))
+
+    def cycle_derivatives(self, positions, omega=1.0, steps=None):
+        """ Geschwindigkeiten und Beschleunigungen aller Beine bei Wellendrehzahl omega, Form wie positions.
+
+        Die Ableitungen werden nur für die Vorlage berechnet. Gespiegelte Beine durchlaufen
+        den Zyklus rückwärts, ihre Geschwindigkeit wechselt daher zusätzlich das Vorzeichen.
+        """
+        steps = self.cycle_steps(steps if steps is not None else len(positions))
+        template_positions = self.template_cycle(positions)
+        velocities, accelerations = self.template.cycle_derivatives(template_positions, omega, steps)
+
+        indices = self.frame_indices(steps)
+        leg_velocities, leg_accelerations = [], []
+        for leg, index in zip(self.legs, indices):
+            velocity, acceleration = velocities[index].copy(), accelerations[index].copy()
+            if leg["mirror"]:
+                velocity[..., 1] *= -1
+                acceleration[..., 0] *= -1
+            leg_velocities.append(velocity)
+            leg_accelerations.append(acceleration)
+        return np.concatenate(leg_velocities, axis=1), np.concatenate(leg_accelerations, axis=1)
+
+    def joint_positions(self):
+        """ Gelenklagen aller Beine aus der aktuellen Stellung der Vorlage, ohne Phasenversatz. """
+        current = self.template.joint_positions()
+        return np.concatenate([self._transform(leg, current) for leg in self.legs])
@@ -0,0 +1,176 @@
+import numpy as np
+from dyads import build_dyad_plan
+
+
+class MechanismBatch:
+    """ Stapel von Mechanismen gleicher Topologie, die gemeinsam gelöst werden.
+
+    Alle Mechanismen müssen dieselben Gelenk-IDs, festen Gelenke und Stäbe haben;
+    Geometrie (Gelenklagen, Stablängen, Kurbelradius, Drehpunkt, Startwinkel) darf
+    abweichen. Die Gelenklagen liegen als (Batch x Gelenke x 2)-Array vor. Dyaden werden
+    für den ganzen Stapel auf einmal geschlossen gelöst, Restschleifen und überzählige
+    Stäbe in einer gemeinsamen, gedämpften Gauß-Newton-Iteration.
+    """
+
+    def __init__(self, mechanisms):
+        if not mechanisms:
+            raise ValueError("Leerer Mechanismus-Stapel.")
+        first = mechanisms[0]
+        for mechanism in mechanisms[1:]:
+            if (mechanism.joint_ids != first.joint_ids or not np.array_equal(mechanism.fixed_mask, first.fixed_mask)
+                    or not np.array_equal(mechanism.rod_index, first.rod_index)):
+                raise ValueError("Mechanismen im Stapel haben unterschiedliche Topologie (Gelenke, feste Gelenke oder Stäbe).")
+
+        self.joint_ids = first.joint_ids
+        self.rods = first.rods
+        self.rod_index = first.rod_index
+        self.moving_mask = first.moving_mask
+        self.moving_column = first.moving_column
+        self.crank = first.crank
+        self.positions = np.stack([mechanism.positions for mechanism in mechanisms])
+        self.rod_lengths = np.stack([mechanism.rod_lengths for mechanism in mechanisms])
+        self.fixed_points = np.stack([np.asarray(mechanism.fixed_point, dtype=float) for mechanism in mechanisms])
+        self.radii = np.array([mechanism.radius for mechanism in mechanisms], dtype=float)
+        self.thetas = np.array([mechanism.theta for mechanism in mechanisms], dtype=float)
+        # Dyadenplan mit Stabindizes statt Längen, damit jeder Mechanismus seine eigenen Längen nutzt
+        known_joints = [j for j, moving in zip(self.joint_ids, self.moving_mask) if not moving]
+        self.dyad_plan, self.unresolved_joints = build_dyad_plan(self.joint_ids, known_joints, self.rods, range(len(self.rods)))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def crank_positions(self, thetas):
+        """ Lage von Gelenk 2 für jeden Mechanismus des Stapels, (Batch x 2). """
+        return self.fixed_points + self.radii[:, None] * np.stack([np.cos(thetas), np.sin(thetas)], axis=1)
+
+    def residuals(self, positions, lengths=None):
+        """ Längenabweichung aller Stäbe, (Batch x Stäbe). lengths wählt bei Teilstapeln die passenden Sollängen. """
+        delta = positions[:, self.rod_index[:, 0]] - positions[:, self.rod_index[:, 1]]
+        return np.hypot(delta[..., 0], delta[..., 1]) - (self.rod_lengths if lengths is None else lengths)
+
+    def jacobian(self, positions):
+        """ Jacobi-Matrizen der Stabresiduen nach den beweglichen Koordinaten, (Batch x Stäbe x Unbekannte). """
+        a, b = self.rod_index[:, 0], self.rod_index[:, 1]
+        delta = positions[:, a] - positions[:, b]
+        length = np.hypot(delta[..., 0], delta[..., 1])
+        unit = delta / np.where(length > 0, length, 1.0)[..., None]
+
+        unknowns = 2 * np.count_nonzero(self.moving_mask)
+        jacobian = np.zeros((len(positions), len(self.rod_index), unknowns))
+        for endpoint, sign in ((a, 1.0), (b, -1.0)):
+            column = self.moving_column[endpoint]
+            rows = np.nonzero(column >= 0)[0]
+            jacobian[:, rows, 2 * column[rows]] += sign * unit[:, rows, 0]
+            jacobian[:, rows, 2 * column[rows] + 1] += sign * unit[:, rows, 1]
+        return jacobian
+
+    def solve_dyads(self, positions):
+        """ Löst alle Dyaden für den ganzen Stapel geschlossen, je Mechanismus den Ast nächst der Vorgängerlage.
+
+        positions wird überschrieben. Gibt eine Maske der Mechanismen zurück, deren Dyaden
+        sich in dieser Stellung schließen lassen.
+        """
+        ok = np.ones(len(positions), dtype=bool)
+        for k, a, b, rod_a, rod_b in self.dyad_plan:
+            r0, r1 = self.rod_lengths[:, rod_a], self.rod_lengths[:, rod_b]
+            p0, p1 = positions[:, a], positions[:, b]
+            delta = p1 - p0
+            d2 = np.einsum("bi,bi->b", delta, delta)
+            d = np.sqrt(np.where(d2 > 0, d2, 1.0))
+            along = (r0 * r0 - r1 * r1 + d2) / (2 * d)
+            h2 = r0 * r0 - along * along
+            # Strecklage: kleine Rundungsfehler noch als Berührpunkt werten
+            ok &= (d2 > 0) & (h2 >= -1e-9 * np.maximum(r0 * r0, 1.0))
+            h = np.sqrt(np.maximum(h2, 0.0))
+            middle = p0 + (along / d)[:, None] * delta
+            offset = (h / d)[:, None] * np.stack([-delta[:, 1], delta[:, 0]], axis=1)
+            first, second = middle + offset, middle - offset
+            nearer = (np.einsum("bi,bi->b", first - positions[:, k], first - positions[:, k])
+                      <= np.einsum("bi,bi->b", second - positions[:, k], second - positions[:, k]))
+            positions[:, k] = np.where(ok[:, None], np.where(nearer[:, None], first, second), positions[:, k])
+        return ok
+
+    def gauss_newton(self, positions, lengths=None, max_iterations=30, tolerance=1e-9):
+        """ Gedämpftes Gauß-Newton (Levenberg-Marquardt) gleichzeitig für alle Mechanismen.
+
+        positions ist ein (Batch x Gelenke x 2)-Startwert mit korrekten festen Gelenken und
+        Kurbellage, lengths die zugehörigen Sollängen (Standard: der ganze Stapel). Jeder Mechanismus hat seine eigene Dämpfung; ein Schritt wird nur
+        übernommen, wenn er die Residuen verkleinert. Gibt (positions, maximale
+        Längenabweichung je Mechanismus) zurück.
+        """
+        lengths = self.rod_lengths if lengths is None else lengths
+        positions = positions.copy()
+        residuals = self.residuals(positions, lengths)
+        cost = np.einsum("br,br->b", residuals, residuals)
+        damping = np.full(len(positions), 1e-3)
+        active = np.abs(residuals).max(axis=1, initial=0.0) > tolerance
+        unknowns = 2 * np.count_nonzero(self.moving_mask)
+        identity = np.eye(unknowns)
+
+        for _ in range(max_iterations):
+            if not active.any():
+                break
+            current = positions[active]
+            jacobian = self.jacobian(current)
+            normal = np.einsum("bri,brj->bij", jacobian, jacobian)
+            gradient = np.einsum("bri,br->bi", jacobian, residuals[active])
+            scale = np.einsum("bii->bi", normal).max(axis=1, initial=1.0)
+            system = normal + (damping[active] * scale)[:, None, None] * identity
+            step = np.linalg.solve(system, -gradient[..., None])[..., 0]
+
+            trial = current.copy()
+            trial[:, self.moving_mask] += step.reshape(len(current), -1, 2)
+            trial_residuals = self.residuals(trial, lengths[active])
+            trial_cost = np.einsum("br,br->b", trial_residuals, trial_residuals)
+
+            better = trial_cost < cost[active]
+            index = np.flatnonzero(active)
+            accepted = index[better]
+            positions[accepted] = trial[better]
+            residuals[accepted] = trial_residuals[better]
+            cost[accepted] = trial_cost[better]
+            damping[accepted] = np.maximum(damping[accepted] / 10, 1e-12)
+            damping[index[~better]] *= 10
+
+            converged = np.abs(residuals[index]).max(axis=1, initial=0.0) <= tolerance
+            stalled = damping[index] > 1e8
+            active[index[converged | stalled]] = False
+        return positions, np.abs(residuals).max(axis=1, initial=0.0)
+
+    def solve_cycle(self, steps=180, tolerance=1e-5):
+        """ Löst eine volle Kurbelumdrehung für alle Mechanismen des Stapels gleichzeitig.
+
+        Jeder Mechanismus dreht ab seinem eigenen Startwinkel in steps gleichen Schritten und
+        startet bei seiner letzten gelösten Lage, wie Mechanism.solve_cycle. Nur Mechanismen
+        mit nicht zerlegbaren Schleifen oder Restfehlern gehen an gauss_newton. Gibt (positions,
+        residuals, failures) mit den Formen (Frames x Batch x Gelenke x 2),
+        (Frames x Batch) und (Frames x Batch) zurück; fehlgeschlagene Frames sind NaN.
+        """
+        batch, joints = self.positions.shape[:2]
+        positions = np.full((steps, batch, joints, 2), np.nan)
+        residuals = np.full((steps, batch), np.nan)
+        failures = np.zeros((steps, batch), dtype=bool)
+
+        last_solved = self.positions.copy()
+        for frame in range(steps):
+            solved = last_solved.copy()
+            solved[:, self.crank] = self.crank_positions(self.thetas + 2 * np.pi * (frame + 1) / steps)
+            ok = self.solve_dyads(solved)
+            error = np.abs(self.residuals(solved)).max(axis=1, initial=0.0)
+
+            refine = ok & ((error > tolerance) | bool(self.unresolved_joints))
+            if refine.any():
+                refined, refined_error = self.gauss_newton(solved[refine], self.rod_lengths[refine])
+                solved[refine], error[refine] = refined, refined_error
+            ok &= error <= tolerance
+
+            positions[frame, ok] = solved[ok]
+            residuals[frame, ok] = error[ok]
+            failures[frame] = ~ok
+            # Nicht lösbare Mechanismen starten im nächsten Frame wieder bei der letzten Lösung
+            last_solved[ok] = solved[ok]
+        return positions, residuals, failures
+
+    def joint_paths(self, positions, joint):
+        """ Bahnkurve eines Gelenks für jeden Mechanismus, (Batch x Frames x 2). """
+        return np.swapaxes(positions[:, :, self.joint_ids.index(joint)], 0, 1)
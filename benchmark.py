@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from dyads import circle_intersections
+from mechanism import Mechanism
+from trajectory_io import read_trajectory, write_trajectory
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+GOLDEN_TOLERANCE = 1e-6
+TIMING_METRICS = ("solve_ms_per_frame", "optimize_ms_per_frame", "render_ms_per_frame", "encode_ms_per_frame",
+                  "db_list_ms", "db_load_ms")
+
+
+def _dyad_point(p0, r0, p1, r1, pick):
+    """ Schnittpunkt zweier Kreise, pick wählt per Schlüsselfunktion einen der beiden Äste. """
+    return np.array(min(circle_intersections(*p0, r0, *p1, r1), key=pick))
+
+
+def fourbar():
+    """ Kurbelschwinge mit festem Gestell zwischen Gelenk 1 und 3. """
+    joints = {1: [0.0, 0.0], 2: [10.0, 0.0], 3: [40.0, 0.0], 4: [30.0, 25.0]}
+    return Mechanism([0.0, 0.0], 10.0, 0, 2, joints, {1, 3}, [(1, 2), (2, 4), (3, 4)])
+
+
+def jansen_leg():
+    """ Ein Bein nach Theo Jansen mit seinen Standard-Stablängen (Kurbel 15, Gestell 38/7.8). """
+    crank, pivot = np.array([0.0, 0.0]), np.array([-38.0, -7.8])
+    pin = crank + np.array([15.0, 0.0])
+    upper = _dyad_point(pin, 50.0, pivot, 41.5, lambda p: -p[1])
+    lower = _dyad_point(pin, 61.9, pivot, 39.3, lambda p: p[1])
+    back = _dyad_point(upper, 55.8, pivot, 40.1, lambda p: p[0])
+    knee = _dyad_point(back, 39.4, lower, 36.7, lambda p: p[0])
+    foot = _dyad_point(knee, 65.7, lower, 49.0, lambda p: p[1])
+    joints = {1: crank, 2: pin, 3: pivot, 4: upper, 5: lower, 6: back, 7: knee, 8: foot}
+    rods = [(1, 2), (2, 4), (3, 4), (2, 5), (3, 5), (4, 6), (3, 6), (6, 7), (5, 7), (7, 8), (5, 8)]
+    return Mechanism(crank, 15.0, 0, 2, joints, {1, 3}, rods)
+
+
+def stress_linkage():
+    """ Jansen-Bein mit sieben zusätzlich angehängten Dreiecken, insgesamt 15 Gelenke. """
+    leg = jansen_leg()
+    joints = dict(leg.joints)
+    rods = list(leg.rods)
+    for j in range(9, 16):
+        a, b = joints[j - 1], joints[j - 2]
+        normal = np.array([-(a - b)[1], (a - b)[0]])
+        joints[j] = (a + b) / 2 + 0.8 * normal
+        rods += [(j - 1, j), (j - 2, j)]
+    return Mechanism(leg.fixed_point, leg.radius, 0, 2, joints, leg.fixed_joints, rods)
+
+
+FIXTURES = {"fourbar": fourbar, "jansen": jansen_leg, "stress15": stress_linkage}
+
+
+def _time_per_call(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def benchmark_solver(mechanism, steps=180):
+    """ Zeit je Frame für solve_position (über solve_cycle) und für den reinen Optimierer. """
+    start = time.perf_counter()
+    positions, residuals, failures = mechanism.solve_cycle(steps)
+    solve_ms = (time.perf_counter() - start) / steps * 1000
+
+    angles = mechanism.cycle_angles(steps)
+    start_theta, start_positions = mechanism.theta, mechanism.joint_positions()
+    start = time.perf_counter()
+    for theta in angles:
+        mechanism.theta = theta
+        mechanism.positions[mechanism.crank] = mechanism.compute_gelenk_2()
+        mechanism.optimize_joints()
+    optimize_ms = (time.perf_counter() - start) / steps * 1000
+    mechanism.theta, mechanism.positions[:] = start_theta, start_positions
+    return positions, failures, {"solve_ms_per_frame": solve_ms, "optimize_ms_per_frame": optimize_ms,
+                                 "failed_frames": int(failures.sum())}
+
+
+def benchmark_render(mechanism, positions, failures, plot_size=200):
+    """ Zeit je Frame für Zeichnen und GIF-Kodierung sowie der Spitzenverbrauch an Python-Speicher. """
+    from encoder import FrameEncoder
+    from simulation import render_frames
+
+    mechanism.show_trajectory = {j: True for j in mechanism.joint_ids[-2:]}
+    frames = max(int(np.count_nonzero(~failures)), 1)
+
+    start = time.perf_counter()
+    for _ in render_frames(mechanism, positions, failures, plot_size, plot_size):
+        pass
+    render_ms = (time.perf_counter() - start) / frames * 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        tracemalloc.start()
+        encode_seconds = 0.0
+        with FrameEncoder(os.path.join(directory, "benchmark.gif")) as encoder:
+            for buf in render_frames(mechanism, positions, failures, plot_size, plot_size):
+                start = time.perf_counter()
+                encoder.append(buf)
+                encode_seconds += time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"render_ms_per_frame": render_ms, "encode_ms_per_frame": encode_seconds / frames * 1000,
+            "peak_memory_mb": peak / 1024 ** 2}
+
+
+def benchmark_storage(mechanism, entries=1000):
+    """ Latenz von get_all_mechanism_names und load_mechanism bei einer Datenbank mit vielen Einträgen.
+
+    Gemessen wird in einer eigenen Datenbank im Temp-Verzeichnis. Die zwischengespeicherte
+    Verbindung des Threads wird dafür beiseitegelegt und danach samt Dateinamen wiederhergestellt.
+    """
+    import storage
+
+    with tempfile.TemporaryDirectory() as directory:
+        previous = storage.DB_FILENAME, storage.LEGACY_JSON_FILENAME, getattr(storage._local, "conn", None)
+        storage.DB_FILENAME = os.path.join(directory, "benchmark.db")
+        storage.LEGACY_JSON_FILENAME = os.path.join(directory, "benchmark.json")
+        storage._local.conn = None
+        try:
+            for i in range(entries):
+                storage.save_mechanism(mechanism, f"variante_{i}")
+            list_ms = _time_per_call(storage.get_all_mechanism_names, 20)
+            load_ms = _time_per_call(lambda: storage.load_mechanism(f"variante_{entries // 2}"), 50)
+        finally:
+            # Vor dem Aufräumen schließen, unter Windows lässt sich eine offene SQLite-Datei nicht löschen
+            if storage._local.conn is not None:
+                storage._local.conn.close()
+            storage.DB_FILENAME, storage.LEGACY_JSON_FILENAME, storage._local.conn = previous
+    return {"db_list_ms": list_ms, "db_load_ms": load_ms}
+
+
+def compare_golden(name, mechanism, positions, update=False):
+    """ Vergleicht den gelösten Zyklus mit der gespeicherten Referenzbahn. Gibt die maximale Abweichung zurück.
+
+    Weichen die fehlgeschlagenen Frames (NaN) von der Referenz ab, ist die Abweichung unendlich.
+    Ohne Referenzbahn wird None zurückgegeben; geschrieben wird sie nur mit update=True.
+    """
+    path = os.path.join(GOLDEN_DIR, f"{name}.mtrj")
+    if update:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        write_trajectory(path, positions, mechanism.joint_ids)
+        return 0.0
+    if not os.path.exists(path):
+        return None
+    golden, joint_ids, _ = read_trajectory(path)
+    if joint_ids != mechanism.joint_ids or golden.shape != positions.shape:
+        return float("inf")
+    golden_failed, failed = np.isnan(golden), np.isnan(positions)
+    if (golden_failed != failed).any():
+        return float("inf")
+    return float(np.abs(golden - positions)[~failed].max(initial=0.0))
+
+
+def run_benchmarks(fixtures=None, render=True, db=True, update_golden=False):
+    """ Führt alle Messungen aus und gibt den Bericht als Dict zurück. """
+    report = {"fixtures": {}}
+    for name in fixtures or FIXTURES:
+        mechanism = FIXTURES[name]()
+        mechanism.verbose = False
+        positions, failures, result = benchmark_solver(mechanism)
+        result["golden_max_error"] = compare_golden(name, mechanism, positions, update_golden)
+        if render:
+            result.update(benchmark_render(mechanism, positions, failures))
+        report["fixtures"][name] = result
+    if db:
+        report["storage"] = benchmark_storage(jansen_leg())
+    return report
+
+
+def check_regressions(report, baseline, max_slowdown):
+    """ Liste der Regressionen: Referenzbahn verletzt oder Zeitmessung um mehr als max_slowdown langsamer. """
+    problems = []
+    for name, result in report["fixtures"].items():
+        if result["golden_max_error"] is None:
+            problems.append(f"{name}: keine Referenzbahn, mit --update-golden anlegen")
+        elif result["golden_max_error"] > GOLDEN_TOLERANCE:
+            problems.append(f"{name}: Abweichung zur Referenzbahn {result['golden_max_error']:.3g}")
+    if baseline:
+        sections = [(name, result, baseline.get("fixtures", {}).get(name, {})) for name, result in report["fixtures"].items()]
+        sections.append(("storage", report.get("storage", {}), baseline.get("storage", {})))
+        for name, result, reference in sections:
+            for metric in TIMING_METRICS:
+                if metric in result and metric in reference and result[metric] > reference[metric] * max_slowdown:
+                    problems.append(f"{name}: {metric} {result[metric]:.3f} ms statt {reference[metric]:.3f} ms")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark- und Referenzbahn-Suite für Löser, Renderer und Speicher")
+    parser.add_argument("--fixture", action="append", choices=sorted(FIXTURES), help="Nur diese Fixtures messen")
+    parser.add_argument("--report", default="benchmark_report.json", help="Ausgabedatei für den JSON-Bericht")
+    parser.add_argument("--baseline", help="Früherer Bericht, gegen den Zeitmessungen geprüft werden")
+    parser.add_argument("--max-slowdown", type=float, default=1.25, help="Erlaubter Faktor gegenüber der Baseline")
+    parser.add_argument("--no-render", action="store_true", help="Zeichnen und Kodieren nicht messen")
+    parser.add_argument("--no-db", action="store_true", help="Datenbank nicht messen")
+    parser.add_argument("--update-golden", action="store_true", help="Referenzbahnen neu schreiben")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.fixture, render=not args.no_render, db=not args.no_db, update_golden=args.update_golden)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = check_regressions(report, baseline, args.max_slowdown)
+    report["regressions"] = problems
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
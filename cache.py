@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Bei jeder Änderung am Löser oder am Dateiformat erhöhen, damit alte Ergebnisse nicht mehr passen
+CACHE_VERSION = 2
+# Dateien, die in dieser Zeit benutzt oder ausgegeben wurden, werden nicht verdrängt
+EVICTION_GRACE_SECONDS = 60
+
+
+def mechanism_key(mechanism, steps=None, adaptive=False, **extra):
+    """ Kanonischer Hash einer Mechanismus-Konfiguration, optional ergänzt um Darstellungsparameter.
+
+    Enthält die Cache-Version und die Lösungsart (steps, adaptive). Gleitkommazahlen werden
+    gerundet, damit numerisches Rauschen aus einer Vorab-Lösung nicht zu einem neuen
+    Schlüssel führt.
+    """
+    def canonical(value):
+        return round(float(value), 9)
+
+    template = getattr(mechanism, "template", None)
+    if template is not None:
+        # Mehrbeinige Baugruppe: Vorlage und Beinanordnung bestimmen das Ergebnis
+        return mechanism_key(template, steps, adaptive, legs=mechanism.legs, **extra)
+
+    config = {
+        "version": CACHE_VERSION,
+        "mode": {"steps": steps, "adaptive": bool(adaptive)},
+        "fixed_point": [canonical(v) for v in mechanism.fixed_point],
+        "radius": canonical(mechanism.radius),
+        "start_angle": canonical(np.degrees(mechanism.theta)),
+        "speed": canonical(np.degrees(mechanism.speed)),
+        "joints": {str(j): [canonical(v) for v in p] for j, p in zip(mechanism.joint_ids, mechanism.positions.tolist())},
+        "fixed_joints": sorted(int(j) for j in mechanism.fixed_joints),
+        "rods": [[int(j1), int(j2)] for j1, j2 in mechanism.rods],
+        "extra": extra,
+    }
+    text = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """ Inhaltsadressierter Cache für gelöste Zyklen und gerenderte Dateien.
+
+    Gelöste Zyklen liegen in einem LRU-Speicher im Arbeitsspeicher und zusätzlich als .npz
+    auf der Platte. Dateien (GIF/MP4/CSV) liegen nur auf der Platte. Überschreitet das
+    Verzeichnis max_disk_bytes, werden die am längsten nicht benutzten Dateien gelöscht.
+    """
+
+    def __init__(self, directory="simulation_cache", max_memory_entries=32, max_disk_bytes=512 * 1024 ** 2):
+        self.directory = directory
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, key[:2], key, name)
+
+    def solve_cycle(self, mechanism, steps=None, trace=None, adaptive=False):
+        """ Wie Mechanism.solve_cycle (bzw. solve_cycle_adaptive), aber aus dem Cache, falls diese Konfiguration schon gelöst wurde. """
+        key = mechanism_key(mechanism, steps=steps, adaptive=adaptive)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._path(key, "cycle.npz")
+        result = None
+        try:
+            with np.load(path) as data:
+                result = data["positions"], data["residuals"], data["failures"]
+            os.utime(path)
+        except FileNotFoundError:
+            # Nicht vorhanden oder gerade von einem anderen Thread verdrängt: neu lösen
+            pass
+        if result is None:
+            if adaptive:
+                result = mechanism.solve_cycle_adaptive(steps, trace=trace)
+            else:
+                result = mechanism.solve_cycle(steps, trace)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = path + f".{threading.get_ident()}.tmp.npz"
+            np.savez(temporary, positions=result[0], residuals=result[1], failures=result[2])
+            os.replace(temporary, path)
+            self._evict(keep=path)
+
+        with self._lock:
+            self._memory[key] = result
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+        return result
+
+    def artifact_path(self, key, name):
+        """ Pfad einer gecachten Datei oder None, falls sie (noch) nicht existiert. """
+        path = self._path(key, name)
+        try:
+            # Frisch benutzte Dateien schützt die Karenzzeit in _evict vor dem Löschen
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store_artifact(self, key, name, source):
+        """ Verschiebt eine fertige Datei in den Cache und gibt ihren neuen Pfad zurück. """
+        path = self._path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(source, path)
+        os.utime(path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep=None):
+        """ Löscht die am längsten unbenutzten Dateien, bis das Verzeichnis unter max_disk_bytes liegt.
+
+        keep und alle Dateien, die innerhalb von EVICTION_GRACE_SECONDS benutzt oder
+        ausgegeben wurden, bleiben erhalten, damit kein Aufrufer eine gerade erhaltene Datei verliert.
+        """
+        recent = time.time() - EVICTION_GRACE_SECONDS
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.max_disk_bytes or mtime >= recent:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+default_cache = ResultCache()
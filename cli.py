@@ -0,0 +1,144 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import storage
+
+
+def export_cycle(mechanism, csv=None, binary=None, video=None, joints=None, steps=None, adaptive=False,
+                 omega=2 * np.pi, plot_size=(100, 100), frame_step=1):
+    """ Löst eine Kurbelumdrehung und schreibt die angeforderten Dateien ohne Streamlit.
+
+    mechanism kann auch eine LegAssembly sein; dann enthalten alle Dateien sämtliche Beine.
+
+    joints wählt die Gelenke für CSV und Bahnkurven im Video (Standard: CSV mit allen
+    Gelenken, Video ohne Bahnkurven). Module für Plot, Video und CSV werden erst
+    importiert, wenn das jeweilige Format verlangt wird. Gibt (positions, failures) zurück.
+    """
+    mechanism.verbose = False
+    if adaptive:
+        positions, residuals, failures = mechanism.solve_cycle_adaptive(steps)
+    else:
+        positions, residuals, failures = mechanism.solve_cycle(steps)
+
+    if binary:
+        from cache import mechanism_key
+        from trajectory_io import write_trajectory
+        write_trajectory(binary, positions, mechanism.joint_ids, mechanism_hash=mechanism_key(mechanism, steps, adaptive))
+
+    if csv:
+        from trajectory_io import write_trajectory_csv
+        selected = joints or mechanism.joint_ids
+        columns = [mechanism.joint_ids.index(j) for j in selected]
+        velocities, accelerations = mechanism.cycle_derivatives(positions, omega, steps)
+        write_trajectory_csv(csv, positions[~failures][:, columns], selected,
+                             velocities[~failures][:, columns], accelerations[~failures][:, columns])
+
+    if video:
+        from encoder import FrameEncoder
+        from simulation import render_frames
+        mechanism.show_trajectory = {j: True for j in joints or []}
+        with FrameEncoder(video, fps=20, frame_step=frame_step) as encoder:
+            for buf in render_frames(mechanism, positions, failures, *plot_size):
+                encoder.append(buf)
+        if encoder.fallback:
+            print(f"Kein H.264-Encoder verfügbar, Video als {encoder.filename} geschrieben.", file=sys.stderr)
+    return positions, failures
+
+
+def report_interference(mechanism, positions, failures, clearance, steps=None):
+    """ Gibt kollidierende Stabpaare eines gelösten Zyklus aus.
+
+    Die Beine einer LegAssembly liegen in verschiedenen Ebenen; geprüft wird dann nur die
+    Vorlage, die dafür einmal neu gelöst wird. Gibt True zurück, wenn Stäbe kollidieren.
+    """
+    from collision import CULL_MARGIN, rod_interference
+    if hasattr(mechanism, "template"):
+        steps = mechanism.cycle_steps(steps)
+        mechanism = mechanism.template
+        positions, _, failures = mechanism.solve_cycle(steps)
+
+    report, rows = rod_interference(mechanism, positions, failures, clearance, steps)
+    if not report["interferes"]:
+        if rows and rows[0]["exact"]:
+            print(f"Keine Kollision, kleinster Abstand {rows[0]['min_clearance']:.2f} "
+                  f"(Stab {rows[0]['rod_a']} / Stab {rows[0]['rod_b']})")
+        elif rows:
+            print(f"Keine Kollision, alle Stabpaare bleiben mehr als {clearance + CULL_MARGIN:.2f} auseinander")
+        return False
+    print(f"Kollision ab {report['first_angle']:.1f}°:")
+    for row in rows:
+        if not np.isnan(row["first_interference_angle"]):
+            print(f"  Stab {row['rod_a']} / Stab {row['rod_b']}: ab {row['first_interference_angle']:.1f}°, "
+                  f"Mindestabstand {row['min_clearance']:.2f} bei {row['min_angle']:.1f}°")
+    return True
+
+
+def main(argv=None):
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Gespeicherten Mechanismus ohne Oberfläche lösen und exportieren")
+    parser.add_argument("name", nargs="?", help="Name des gespeicherten Mechanismus")
+    parser.add_argument("--list", action="store_true", help="Gespeicherte Mechanismen auflisten")
+    parser.add_argument("--check", action="store_true", help="Nur Vorabprüfung (Freiheitsgrade, montierbare Winkel) ausgeben")
+    parser.add_argument("--db", default=storage.DB_FILENAME, help="SQLite-Datenbank der Mechanismen")
+    parser.add_argument("--csv", help="Bahnkurven mit Geschwindigkeiten und Beschleunigungen als CSV")
+    parser.add_argument("--binary", help="Alle Gelenklagen als Binärdatei (.mtrj)")
+    parser.add_argument("--video", help="Animation als GIF oder MP4 (Format aus der Dateiendung)")
+    parser.add_argument("--joint", type=int, action="append", help="Gelenk für CSV und Bahnkurve im Video, mehrfach möglich")
+    parser.add_argument("--steps", type=int, help="Frames pro Umdrehung (Standard: aus der gespeicherten Geschwindigkeit)")
+    parser.add_argument("--adaptive", action="store_true", help="Adaptive Schrittweite mit interpolierten Frames")
+    parser.add_argument("--rpm", type=float, default=60.0, help="Kurbeldrehzahl für Geschwindigkeiten (U/min)")
+    parser.add_argument("--plot-size", type=float, nargs=2, default=[100, 100], metavar=("X", "Y"), help="Plotgröße des Videos")
+    parser.add_argument("--frame-step", type=int, default=1, help="Nur jeden n-ten Frame ins Video schreiben")
+    parser.add_argument("--legs", type=int, default=1, help="Anzahl gleicher Beine mit gleichmäßigem Phasenversatz an einer Kurbelwelle")
+    parser.add_argument("--mirror", action="store_true", help="Jedes Bein zusätzlich an der Kurbelachse gespiegelt")
+    parser.add_argument("--clearance", type=float, help="Stäbe über den Zyklus auf Kreuzungen und Mindestabstand (mm) prüfen")
+    parser.add_argument("--leg-spacing", type=float, default=0.0, help="Versatz aufeinanderfolgender Beine in X (mm)")
+    args = parser.parse_args(argv)
+
+    storage.DB_FILENAME = args.db
+    try:
+        if args.list:
+            print("\n".join(storage.get_all_mechanism_names()))
+            return 0
+        if not args.name:
+            parser.error("Name des Mechanismus fehlt (oder --list angeben).")
+        mechanism = storage.load_mechanism(args.name)
+    except storage.StorageError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.check:
+        from analysis import analyze_mechanism
+        report = analyze_mechanism(mechanism)
+        for message in report["problems"] + report["warnings"]:
+            print(message)
+        print(f"Freiheitsgrade (Grübler/Rang): {report['gruebler']}/{report['dof']}, "
+              f"montierbar: {report['feasible_fraction']:.0%} der Umdrehung")
+        return 1 if report["problems"] else 0
+
+    if args.legs > 1 or args.mirror:
+        # Gelöst wird nur ein Bein, die übrigen entstehen durch Phasenversatz und Spiegelung
+        from assembly import LegAssembly, walker_legs
+        mechanism = LegAssembly(mechanism, walker_legs(args.legs, mirror=args.mirror, spacing=args.leg_spacing))
+
+    unknown = [j for j in args.joint or [] if j not in mechanism.joint_ids]
+    if unknown:
+        parser.error(f"Unbekannte Gelenke: {unknown}")
+
+    positions, failures = export_cycle(
+        mechanism, csv=args.csv, binary=args.binary, video=args.video, joints=args.joint, steps=args.steps,
+        adaptive=args.adaptive, omega=args.rpm * 2 * np.pi / 60, plot_size=args.plot_size, frame_step=args.frame_step
+    )
+    if args.clearance is not None:
+        report_interference(mechanism, positions, failures, args.clearance, args.steps)
+
+    written = ", ".join(f for f in (args.csv, args.binary, args.video) if f) or "keine Dateien"
+    print(f"{len(positions)} Frames gelöst, {int(failures.sum())} nicht lösbar, geschrieben: {written} "
+          f"({time.perf_counter() - start:.2f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
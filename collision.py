@@ -0,0 +1,162 @@
+import numpy as np
+
+# Stabpaare, die weiter als Mindestabstand plus diese Reserve (mm) auseinanderliegen, nur grob prüfen
+CULL_MARGIN = 5.0
+
+
+def rod_pairs(rod_index):
+    """ Alle Stabpaare (i, k) mit i < k, die kein gemeinsames Gelenk haben, als (Paare x 2)-Array.
+
+    Stäbe an einem gemeinsamen Gelenk berühren sich dort immer und werden nicht geprüft,
+    ebenso Stäbe, die ein Gelenk mit sich selbst verbinden.
+    """
+    first, second = np.triu_indices(len(rod_index), k=1)
+    a, b = rod_index[first], rod_index[second]
+    disjoint = ((a[:, 0] != b[:, 0]) & (a[:, 0] != b[:, 1]) & (a[:, 1] != b[:, 0]) & (a[:, 1] != b[:, 1])
+                & (a[:, 0] != a[:, 1]) & (b[:, 0] != b[:, 1]))
+    return np.stack([first[disjoint], second[disjoint]], axis=1)
+
+
+def _point_segment_distance(p, s0, s1):
+    d = s1 - s0
+    dd = np.einsum("...i,...i->...", d, d)
+    t = np.clip(np.einsum("...i,...i->...", p - s0, d) / np.where(dd > 0, dd, 1.0), 0.0, 1.0)
+    closest = s0 + t[..., None] * d
+    return np.hypot(*np.moveaxis(p - closest, -1, 0))
+
+
+def _cross(o, a, b):
+    return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+
+def segment_distance(a0, a1, b0, b1):
+    """ Kleinster Abstand der Strecken a0-a1 und b0-b1, elementweise über beliebige (... x 2)-Arrays.
+
+    Kreuzen sich die Strecken, ist der Abstand 0; sonst liegt das Minimum an einem der vier
+    Endpunkte.
+    """
+    distance = np.minimum(
+        np.minimum(_point_segment_distance(a0, b0, b1), _point_segment_distance(a1, b0, b1)),
+        np.minimum(_point_segment_distance(b0, a0, a1), _point_segment_distance(b1, a0, a1)),
+    )
+    crossing = ((_cross(b0, b1, a0) * _cross(b0, b1, a1) < 0) & (_cross(a0, a1, b0) * _cross(a0, a1, b1) < 0))
+    return np.where(crossing, 0.0, distance)
+
+
+def _box_gap(lower, upper, pairs):
+    """ Untere Schranke für den Abstand zweier Stäbe aus ihren achsparallelen Hüllrechtecken. """
+    first, second = pairs[:, 0], pairs[:, 1]
+    gap = np.maximum(np.maximum(lower[..., first, :] - upper[..., second, :], lower[..., second, :] - upper[..., first, :]), 0.0)
+    return np.hypot(gap[..., 0], gap[..., 1])
+
+
+def _frame_distances(positions, rod_index, pairs, cull_distance):
+    """ Abstände (Frames x Paare); wo die Hüllrechtecke weiter als cull_distance auseinanderliegen, nur deren Schranke.
+
+    Gibt (Abstände, Maske der exakt gerechneten Einträge) zurück.
+    """
+    start, end = positions[:, rod_index[:, 0]], positions[:, rod_index[:, 1]]
+    bound = _box_gap(np.minimum(start, end), np.maximum(start, end), pairs)
+    near = np.ones(bound.shape, dtype=bool) if cull_distance is None else bound <= cull_distance
+    frame, pair = np.nonzero(near)
+    first, second = pairs[pair, 0], pairs[pair, 1]
+    bound[near] = segment_distance(start[frame, first], end[frame, first], start[frame, second], end[frame, second])
+    return bound, near
+
+
+def interference_report(positions, rod_index, failures=None, angles=None, clearance=0.0, cull_distance=None, chunk_size=64):
+    """ Prüft über einen gelösten Zyklus, ob sich Stäbe kreuzen oder näher als clearance kommen.
+
+    positions ist ein (Frames x Gelenke x 2)-Array wie von solve_cycle, angles die Kurbelwinkel
+    der Frames in Grad (Standard: Framenummer). Die Grobprüfung verwirft zuerst Paare, deren
+    über den ganzen Zyklus überstrichene Hüllrechtecke weiter als cull_distance auseinanderliegen,
+    dann je Frame Paare mit getrennten Hüllrechtecken; nur der Rest wird exakt gerechnet. Für
+    verworfene Paare ist min_clearance die Schranke aus den Hüllrechtecken; exact ist dann
+    False. Ohne cull_distance wird alles exakt gerechnet.
+
+    Gibt ein Dict mit pairs (Stabindizes), min_clearance, exact, min_frame und first_frame (-1 ohne
+    Kollision) je Paar sowie interferes, first_interference_frame und first_angle für den ganzen Zyklus zurück.
+    """
+    pairs = rod_pairs(rod_index)
+    frames = np.flatnonzero(~failures) if failures is not None else np.arange(len(positions))
+    angles = np.arange(len(positions), dtype=float) if angles is None else np.asarray(angles, dtype=float)
+    min_clearance = np.full(len(pairs), np.inf)
+    exact = np.ones(len(pairs), dtype=bool)
+    min_frame = np.full(len(pairs), -1)
+    first_frame = np.full(len(pairs), -1)
+
+    checked = np.ones(len(pairs), dtype=bool)
+    if cull_distance is not None and len(frames):
+        start, end = positions[frames][:, rod_index[:, 0]], positions[frames][:, rod_index[:, 1]]
+        swept = _box_gap(np.minimum(start, end).min(axis=0), np.maximum(start, end).max(axis=0), pairs)
+        checked = swept <= cull_distance
+        min_clearance[~checked] = swept[~checked]
+        exact[~checked] = False
+
+    subset = pairs[checked]
+    index = np.flatnonzero(checked)
+    for offset in range(0, len(frames) if len(subset) else 0, chunk_size):
+        block = frames[offset:offset + chunk_size]
+        distance, near = _frame_distances(positions[block], rod_index, subset, cull_distance)
+
+        lowest = distance.argmin(axis=0)
+        better = distance[lowest, np.arange(len(subset))] < min_clearance[index]
+        min_clearance[index[better]] = distance[lowest[better], np.flatnonzero(better)]
+        # Stammt das Minimum aus einem grob verworfenen Frame, ist es nur eine Schranke
+        exact[index[better]] = near[lowest[better], np.flatnonzero(better)]
+        min_frame[index[better]] = block[lowest[better]]
+
+        hit = distance <= clearance
+        new = hit.any(axis=0) & (first_frame[index] < 0)
+        first_frame[index[new]] = block[hit[:, new].argmax(axis=0)]
+
+    colliding = first_frame[first_frame >= 0]
+    first = int(colliding.min()) if len(colliding) else -1
+    return {
+        "pairs": pairs, "min_clearance": min_clearance, "exact": exact, "min_frame": min_frame, "first_frame": first_frame,
+        "interferes": first >= 0, "first_interference_frame": first, "first_angle": float(angles[first]) if first >= 0 else None,
+    }
+
+
+def first_interference(positions, rod_index, failures=None, clearance=0.0, chunk_size=16):
+    """ Schneller Ausschlusstest für Parameterstudien: erster Frame mit Kollision oder None.
+
+    Rechnet nur Paare exakt, deren Hüllrechtecke näher als clearance liegen, und bricht beim
+    ersten Treffer ab.
+    """
+    pairs = rod_pairs(rod_index)
+    if not len(pairs):
+        return None
+    frames = np.flatnonzero(~failures) if failures is not None else np.arange(len(positions))
+    for offset in range(0, len(frames), chunk_size):
+        block = frames[offset:offset + chunk_size]
+        hit = (_frame_distances(positions[block], rod_index, pairs, clearance)[0] <= clearance).any(axis=1)
+        if hit.any():
+            return int(block[hit.argmax()])
+    return None
+
+
+def rod_interference(mechanism, positions, failures, clearance=0.0, steps=None, cull_distance=None):
+    """ interference_report für einen gelösten Zyklus eines Mechanismus, mit Stäben als Gelenkpaaren und Winkeln in Grad.
+
+    steps muss zu dem Aufruf von solve_cycle passen, mit dem positions entstanden ist.
+    Ohne cull_distance gilt clearance + CULL_MARGIN; weiter entfernte Paare erhalten nur die
+    Schranke aus den Hüllrechtecken (exact False) und keinen Winkel. cull_distance=np.inf
+    rechnet alles exakt. Gibt (Bericht, Liste von Zeilen je Stabpaar) zurück; exakte Zeilen
+    stehen nach Mindestabstand sortiert vorn, Schranken dahinter.
+    """
+    if cull_distance is None:
+        cull_distance = clearance + CULL_MARGIN
+    angles = np.degrees(mechanism.cycle_angles(steps)) % 360.0
+    report = interference_report(positions, mechanism.rod_index, failures, angles, clearance, cull_distance)
+    rows = []
+    for (i, k), distance, exact, frame, first in zip(report["pairs"], report["min_clearance"], report["exact"],
+                                                    report["min_frame"], report["first_frame"]):
+        (a1, a2), (b1, b2) = mechanism.rods[i], mechanism.rods[k]
+        rows.append({
+            "rod_a": f"{a1}-{a2}", "rod_b": f"{b1}-{b2}", "min_clearance": float(distance), "exact": bool(exact),
+            "min_angle": float(angles[frame]) if frame >= 0 and exact else np.nan,
+            "first_interference_angle": float(angles[first]) if first >= 0 else np.nan,
+        })
+    rows.sort(key=lambda row: (not row["exact"], row["min_clearance"]))
+    return report, rows
@@ -0,0 +1,162 @@
+import numpy as np
+from dyads import build_dyad_plan
+
+# Ab dieser Zahl von Unbekannten wird ein Teilsystem mit dünn besetzter Jacobi-Matrix gelöst
+SPARSE_UNKNOWNS = 60
+
+
+def rod_jacobian(positions, rod_index, columns, unknowns, sparse=False):
+    """ Jacobi-Matrix der Stablängen nach den Koordinaten der Unbekannten.
+
+    columns gibt für jedes Gelenk seinen Index im Unbekanntenvektor an (-1 für bekannte
+    Gelenke). Jede Zeile hat höchstens vier Einträge; mit sparse=True wird eine
+    scipy.sparse-CSR-Matrix zurückgegeben, sonst ein dichtes Array.
+    """
+    a, b = rod_index[:, 0], rod_index[:, 1]
+    delta = positions[a] - positions[b]
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    unit = delta / np.where(length > 0, length, 1.0)[:, None]
+
+    jacobian = None if sparse else np.zeros((len(rod_index), unknowns))
+    triplets = []
+    for endpoint, sign in ((a, 1.0), (b, -1.0)):
+        column = columns[endpoint]
+        rows = np.nonzero(column >= 0)[0]
+        for axis in (0, 1):
+            if sparse:
+                triplets.append((rows, 2 * column[rows] + axis, sign * unit[rows, axis]))
+            else:
+                jacobian[rows, 2 * column[rows] + axis] += sign * unit[rows, axis]
+    if not sparse:
+        return jacobian
+
+    from scipy.sparse import csr_matrix
+    rows, cols, values = (np.concatenate(part) for part in zip(*triplets))
+    # Doppelte Einträge (Stab mit beiden Enden am selben Gelenk) werden beim Aufbau summiert
+    return csr_matrix((values, (rows, cols)), shape=(len(rod_index), unknowns))
+
+
+def connected_components(joints, rods):
+    """ Zusammenhangskomponenten der Gelenke, wenn nur Stäbe zwischen diesen Gelenken zählen. """
+    members = set(joints)
+    neighbours = {j: [] for j in joints}
+    for j1, j2 in rods:
+        if j1 in members and j2 in members and j1 != j2:
+            neighbours[j1].append(j2)
+            neighbours[j2].append(j1)
+    components, seen = [], set()
+    for j in joints:
+        if j in seen:
+            continue
+        component, queue = [], [j]
+        seen.add(j)
+        while queue:
+            current = queue.pop()
+            component.append(current)
+            for n in neighbours[current]:
+                if n not in seen:
+                    seen.add(n)
+                    queue.append(n)
+        components.append(component)
+    return components
+
+
+def peel_cluster(component, known, rods):
+    """ Verkleinert eine Komponente auf einen Kern, aus dem sich der Rest per Dyaden ergibt.
+
+    Ein Gelenk wird abgelöst, wenn es über mindestens zwei Stäbe an den übrigen Gelenken
+    hängt und der verbleibende Kern nicht unterbestimmt wird. Die abgelösten Gelenke löst
+    der nächste Dyadenplan, sobald der Kern bekannt ist.
+    """
+    core = set(component)
+    incident = {j: [] for j in core}
+    for j1, j2 in rods:
+        if j1 != j2:
+            for j, other in ((j1, j2), (j2, j1)):
+                if j in incident:
+                    incident[j].append(other)
+
+    def attached(j):
+        return sum(1 for other in incident[j] if other in core or other in known)
+
+    # Stäbe, die den Kern an sich selbst oder an bekannte Gelenke binden
+    constraints = sum(attached(j) for j in core) - sum(1 for j1, j2 in rods if j1 != j2 and j1 in core and j2 in core)
+    progress = True
+    while progress and len(core) > 1:
+        progress = False
+        for j in list(core):
+            count = attached(j)
+            if count >= 2 and constraints - count >= 2 * (len(core) - 1):
+                core.discard(j)
+                constraints -= count
+                progress = True
+    return [j for j in component if j in core]
+
+
+def grow_cluster(core, known, rods, max_size=12):
+    """ Sucht im Kern ein kleines Teilsystem, das sich allein aus den bekannten Gelenken bestimmen lässt.
+
+    Ausgehend von jedem an Bekanntes angebundenen Gelenk wird gierig das Nachbargelenk mit den
+    meisten Stäben zur bisherigen Auswahl ergänzt, bis die Auswahl mindestens so viele Stäbe
+    wie Unbekannte hat. Gibt die kleinste gefundene Auswahl zurück oder None. Die Zählung ist
+    nur notwendig, nicht hinreichend; bleiben Längenfehler, greift in solve_position der
+    Gesamtoptimierer.
+    """
+    members = set(core)
+    incident = {j: [] for j in members}
+    for j1, j2 in rods:
+        if j1 != j2:
+            for j, other in ((j1, j2), (j2, j1)):
+                if j in incident:
+                    incident[j].append(other)
+
+    best = None
+    for seed in core:
+        if not any(other in known for other in incident[seed]):
+            continue
+        selection = {seed}
+        constraints = sum(1 for other in incident[seed] if other in known)
+        while len(selection) <= max_size and (best is None or len(selection) < len(best)):
+            if constraints >= 2 * len(selection):
+                best = selection
+                break
+            candidates = {other for j in selection for other in incident[j] if other in members and other not in selection}
+            if not candidates:
+                break
+            added = max(candidates, key=lambda c: sum(1 for other in incident[c] if other in selection or other in known))
+            constraints += sum(1 for other in incident[added] if other in selection or other in known)
+            selection = selection | {added}
+    if best is None or len(best) == len(members):
+        return None
+    return [j for j in core if j in best]
+
+
+def build_solve_plan(joint_ids, known_joints, rods, lengths):
+    """ Zerlegt den Stabgraphen in Lösungsschritte, die nacheinander ausgeführt werden.
+
+    Zuerst werden alle Dyaden vom Gestell und der Kurbel aus gelöst. Die übrigen Gelenke
+    zerfallen in voneinander unabhängige Komponenten; von jeder wird nur der nicht
+    zerlegbare Kern (oder ein kleineres, schon bestimmtes Teilsystem daraus) gelöst,
+    danach geht es wieder mit Dyaden und den verbleibenden Komponenten weiter.
+    Gibt eine Liste von ("dyads", plan) und ("cluster", Gelenkindizes, Stabindizes) zurück.
+    """
+    index = {j: i for i, j in enumerate(joint_ids)}
+    known = set(known_joints)
+    stages = []
+    while True:
+        plan, unresolved = build_dyad_plan(joint_ids, known, rods, lengths)
+        if plan:
+            stages.append(("dyads", plan))
+            known.update(joint_ids[k] for k, *_ in plan)
+        if not unresolved:
+            return stages
+
+        for component in connected_components(unresolved, rods):
+            core = peel_cluster(component, known, rods)
+            # Große Kerne, die sich schrittweise von außen lösen lassen, werden weiter aufgeteilt
+            core = grow_cluster(core, known, rods) or core
+            members = set(core)
+            rod_rows = [r for r, (j1, j2) in enumerate(rods)
+                        if j1 != j2 and (j1 in members or j2 in members) and {j1, j2} <= members | known]
+            stages.append(("cluster", np.array([index[j] for j in core], dtype=int), np.array(rod_rows, dtype=int)))
+            known.update(core)
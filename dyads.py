@@ -0,0 +1,77 @@
+import math
+
+
+def build_dyad_plan(joint_ids, known_joints, rods, lengths):
+    """ Zerlegt den Stabgraphen vom Kurbelgelenk aus in RRR-Dyaden.
+
+    Ein unbekanntes Gelenk bildet eine Dyade, sobald es über zwei Stäbe an bereits
+    bekannte Gelenke hängt. Gibt den Lösungsplan als Liste von
+    (Gelenk, Elternteil A, Elternteil B, Länge A, Länge B) in Indexform sowie die
+    nicht zerlegbaren Gelenke zurück.
+    """
+    index = {j: i for i, j in enumerate(joint_ids)}
+    neighbours = {j: {} for j in joint_ids}
+    for (j1, j2), length in zip(rods, lengths):
+        if j1 != j2:
+            neighbours[j1].setdefault(j2, length)
+            neighbours[j2].setdefault(j1, length)
+
+    known = set(known_joints)
+    plan = []
+    progress = True
+    while progress:
+        progress = False
+        for j in joint_ids:
+            if j in known:
+                continue
+            parents = [(n, length) for n, length in neighbours[j].items() if n in known]
+            if len(parents) >= 2:
+                (a, length_a), (b, length_b) = parents[:2]
+                plan.append((index[j], index[a], index[b], length_a, length_b))
+                known.add(j)
+                progress = True
+
+    unresolved = [j for j in joint_ids if j not in known]
+    return plan, unresolved
+
+
+def circle_intersections(x0, y0, r0, x1, y1, r1):
+    """ Schnittpunkte zweier Kreise, None falls sie sich nicht schneiden. """
+    dx, dy = x1 - x0, y1 - y0
+    d2 = dx * dx + dy * dy
+    if d2 == 0.0:
+        return None
+    d = math.sqrt(d2)
+    a = (r0 * r0 - r1 * r1 + d2) / (2.0 * d)
+    h2 = r0 * r0 - a * a
+    if h2 < 0.0:
+        # Strecklage: kleine Rundungsfehler noch als Berührpunkt werten
+        if h2 < -1e-9 * max(r0 * r0, 1.0):
+            return None
+        h2 = 0.0
+    h = math.sqrt(h2)
+    mx, my = x0 + a * dx / d, y0 + a * dy / d
+    ox, oy = -dy * h / d, dx * h / d
+    return (mx + ox, my + oy), (mx - ox, my - oy)
+
+
+def solve_dyads(plan, positions):
+    """ Löst alle Dyaden des Plans geschlossen und wählt je den Ast, der der vorherigen Lage am nächsten liegt.
+
+    positions ist ein (N x 2)-Array mit den festen Gelenken und der Vorgängerlage
+    der beweglichen Gelenke; es wird überschrieben. Gibt False zurück, wenn eine
+    Dyade in dieser Stellung nicht schließbar ist.
+    """
+    points = positions.tolist()
+    for k, a, b, length_a, length_b in plan:
+        candidates = circle_intersections(*points[a], length_a, *points[b], length_b)
+        if candidates is None:
+            return False
+        (x1, y1), (x2, y2) = candidates
+        px, py = points[k]
+        if (x1 - px) ** 2 + (y1 - py) ** 2 <= (x2 - px) ** 2 + (y2 - py) ** 2:
+            points[k] = [x1, y1]
+        else:
+            points[k] = [x2, y2]
+    positions[:] = points
+    return True
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+
+class FrameEncoder:
+    """ Schreibt Simulationsframes direkt beim Erzeugen als GIF oder MP4.
+
+    Es wird immer nur der aktuelle Frame gehalten, der Speicherbedarf bleibt damit
+    unabhängig von der Zykluslänge. Das Format ergibt sich aus der Dateiendung.
+    Mit frame_step wird nur jeder n-te Frame geschrieben, die Abspieldauer bleibt gleich.
+    MP4 wird als H.264 geschrieben (über imageio/ffmpeg, sonst OpenCV), damit Browser es
+    abspielen; steht kein H.264-Encoder zur Verfügung, wird stattdessen ein GIF geschrieben,
+    filename entsprechend geändert und fallback gesetzt.
+    """
+
+    def __init__(self, filename, fps=20, frame_step=1, palette_size=256):
+        self.filename = filename
+        self.format = os.path.splitext(filename)[1].lower().lstrip(".")
+        if self.format not in ("gif", "mp4"):
+            raise ValueError(f"Nicht unterstütztes Videoformat: {self.format}")
+        self.fps = fps
+        self.frame_step = max(int(frame_step), 1)
+        self.palette_size = palette_size
+        self.frame_count = 0
+        self.written = 0
+        self.fallback = False
+        self._file = None
+        self._palette = None
+        self._video = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, rgba):
+        """ Nimmt einen RGBA-Frame (H x W x 4, uint8) entgegen und schreibt ihn, falls er nicht ausgedünnt wird. """
+        index = self.frame_count
+        self.frame_count += 1
+        if index % self.frame_step:
+            return
+        if self.format == "gif":
+            self._append_gif(rgba)
+        else:
+            self._append_mp4(rgba)
+        self.written += 1
+
+    def _append_gif(self, rgba):
+        image = Image.fromarray(np.ascontiguousarray(rgba[:, :, :3]))
+        if self._palette is None:
+            # Globale Palette aus dem ersten Frame, alle weiteren Frames werden darauf abgebildet
+            self._palette = image.quantize(colors=self.palette_size)
+            header, _ = GifImagePlugin.getheader(self._palette.copy(), info={"loop": 0})
+            self._file = open(self.filename, "wb")
+            self._file.writelines(header)
+            frame = self._palette
+        else:
+            frame = image.quantize(palette=self._palette, dither=Image.Dither.NONE)
+        duration = 1000 * self.frame_step / self.fps
+        self._file.writelines(GifImagePlugin.getdata(frame, duration=duration))
+
+    def _append_mp4(self, rgba):
+        if self._video is None:
+            self._video = self._open_mp4(*rgba.shape[1::-1])
+            if self._video is None:
+                # MPEG-4 Part 2 ("mp4v") spielen Browser nicht ab, daher lieber ein GIF
+                if os.path.exists(self.filename):
+                    os.remove(self.filename)
+                self.format = "gif"
+                self.filename = os.path.splitext(self.filename)[0] + ".gif"
+                self.fallback = True
+                self._append_gif(rgba)
+                return
+        self._video[0](np.ascontiguousarray(rgba[:, :, :3]))
+
+    def _open_mp4(self, width, height):
+        """ (Schreiben, Schließen) für einen H.264-Writer oder None, falls keiner verfügbar ist. """
+        fps = self.fps / self.frame_step
+        try:
+            import imageio.v2 as imageio
+
+            # macro_block_size=2: yuv420p braucht gerade Seitenlängen, größere Blöcke würden skalieren
+            writer = imageio.get_writer(self.filename, format="FFMPEG", fps=fps, codec="libx264",
+                                        pixelformat="yuv420p", macro_block_size=2)
+            return writer.append_data, writer.close
+        except (ImportError, RuntimeError, OSError):
+            pass
+        try:
+            import cv2
+        except ImportError:
+            return None
+        video = cv2.VideoWriter(self.filename, cv2.VideoWriter_fourcc(*"avc1"), fps, (width, height))
+        if not video.isOpened():
+            video.release()
+            return None
+        return (lambda rgb: video.write(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))), video.release
+
+    def close(self):
+        """ Schließt die Datei. Danach ist das GIF bzw. MP4 vollständig. """
+        if self._file is not None:
+            self._file.write(b";")
+            self._file.close()
+            self._file = None
+        if self._video is not None:
+            self._video[1]()
+            self._video = None
@@ -0,0 +1,63 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class FrameTrace:
+    """ Sammelt pro Frame Solver-Kennzahlen und die Wandzeit der Phasen Lösen, Zeichnen, Übertragen und Kodieren. """
+
+    PHASES = ("solve", "draw", "transmit", "encode")
+
+    def __init__(self):
+        self.frames = {}
+
+    def add(self, frame, **values):
+        """ Ergänzt den Eintrag eines Frames um beliebige Werte. """
+        self.frames.setdefault(int(frame), {"frame": int(frame)}).update(values)
+
+    @contextmanager
+    def timed(self, frame, phase):
+        """ Misst die Dauer des Blocks und addiert sie als <phase>_ms zum Frame. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = self.frames.setdefault(int(frame), {"frame": int(frame)})
+            record[f"{phase}_ms"] = record.get(f"{phase}_ms", 0.0) + (time.perf_counter() - start) * 1000
+
+    def rows(self):
+        return [self.frames[frame] for frame in sorted(self.frames)]
+
+    def columns(self):
+        names = []
+        for row in self.rows():
+            names += [name for name in row if name not in names]
+        return names
+
+    def summary(self):
+        """ Mittelwert, Maximum und Summe je numerischer Kennzahl über alle Frames. """
+        result = {}
+        for name in self.columns():
+            values = [row[name] for row in self.rows() if isinstance(row.get(name), (int, float)) and not isinstance(row.get(name), bool)]
+            if name in ("frame", "theta") or not values:
+                continue
+            values = np.asarray(values, dtype=float)
+            result[name] = {"mean": float(values.mean()), "max": float(values.max()), "total": float(values.sum())}
+        failures = sum(1 for row in self.rows() if row.get("success") is False)
+        result["failed_frames"] = {"mean": failures / max(len(self.frames), 1), "max": failures, "total": failures}
+        return result
+
+    def to_json(self, filename):
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "frames": self.rows()}, f, indent=2, default=float)
+        return filename
+
+    def to_csv(self, filename):
+        with open(filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns())
+            writer.writeheader()
+            writer.writerows(self.rows())
+        return filename
@@ -2,8 +2,15 @@ import cv2
 import streamlit as st
 import numpy as np
 from mechanism import Mechanism
-from storage import save_mechanism, load_mechanism, get_all_mechanism_names, delete_mechanism
-from simulation import simulate_mechanism
+from storage import StorageError, save_mechanism, load_mechanism, get_all_mechanism_names, delete_mechanism
+from worker import submit_simulation, get_job, cancel_job
+from analysis import analyze_mechanism
+from assembly import LegAssembly, walker_legs
+from batch import MechanismBatch
+from cache import default_cache
+from collision import rod_interference
+from simulation import foot_path_figure, playback_figure, rod_polyline
+from sweep import foot_path_metrics
 import matplotlib.pyplot as plt
 import time
 import pandas as pd
@@ -25,8 +32,11 @@ if "loaded_data" not in st.session_state:
 # mechanismen laden
 if st.sidebar.button("Laden"):
     if selected_mechanism != "-":
-        loaded_mech = load_mechanism(selected_mechanism)
-        if loaded_mech:
+        try:
+            loaded_mech = load_mechanism(selected_mechanism)
+        except StorageError as e:
+            st.sidebar.error(str(e))
+        else:
             st.session_state.loaded_data = {
                 "mid_x": loaded_mech.fixed_point[0],
                 "mid_y": loaded_mech.fixed_point[1],
@@ -35,7 +45,7 @@ if st.sidebar.button("Laden"):
                 "speed": np.degrees(loaded_mech.speed),
                 "num_joints": len(loaded_mech.joints),
                 "num_rods": len(loaded_mech.rods),
-                "joints": loaded_mech.joints,
+                "joints": dict(loaded_mech.joints),
                 "fixed_joints": loaded_mech.fixed_joints,
                 "rods": loaded_mech.rods
             }
@@ -46,7 +56,11 @@ if st.sidebar.button("Laden"):
 # Löschen
 if st.sidebar.button("🗑 Löschen"):
     if selected_mechanism != "-":
-        delete_mechanism(selected_mechanism)
+        try:
+            delete_mechanism(selected_mechanism)
+            st.sidebar.success(f"🗑 Mechanismus '{selected_mechanism}' gelöscht!")
+        except StorageError as e:
+            st.sidebar.error(str(e))
     else:
         st.sidebar.error("⚠ Bitte einen Mechanismus zum Löschen auswählen.")
 
@@ -64,7 +78,7 @@ radius = st.sidebar.number_input("Rotationsradius für Gelenk 2", value=st.sess
 start_angle = st.sidebar.slider("Startwinkel von Gelenk 2 (Grad)", 0, 360, int(st.session_state.loaded_data["start_angle"]) if st.session_state.loaded_data else 0)
 speed = st.sidebar.slider("Geschwindigkeit (°/Frame)", 1, 10, int(st.session_state.loaded_data["speed"]) if st.session_state.loaded_data else 2)
 
-num_joints = st.sidebar.number_input("Anzahl der Gelenke", min_value=4, max_value=15, value=st.session_state.loaded_data["num_joints"] if st.session_state.loaded_data else 4, step=1)
+num_joints = st.sidebar.number_input("Anzahl der Gelenke", min_value=4, max_value=200, value=st.session_state.loaded_data["num_joints"] if st.session_state.loaded_data else 4, step=1)
 num_rods = st.sidebar.number_input("Anzahl der Stäbe", min_value=3, max_value=num_joints*(num_joints-1)//2, value=st.session_state.loaded_data["num_rods"] if st.session_state.loaded_data else 4, step=1)
 
 joints = {1: np.array([mid_x, mid_y])}  
@@ -139,73 +153,191 @@ ax.set_xlim ([-plot_size_x / 2, plot_size_x / 2])
 ax.set_ylim([-plot_size_y / 2, plot_size_y / 2])
 ax.set_title("Ausgangsstellung des Mechanismus")
 
-# Gelenke zeichnen
-for j, coord in joints.items():
-    ax.plot(coord[0], coord[1], 'ro' if j in fixed_joints else 'bo', markersize=8)
+# Gelenke zeichnen, direkt aus dem Positionsarray des Mechanismus
+ax.plot(*mech.positions[mech.fixed_mask].T, 'ro', markersize=8)
+ax.plot(*mech.positions[~mech.fixed_mask].T, 'bo', markersize=8)
+for j, coord in zip(mech.joint_ids, mech.positions):
     ax.text (coord[0] + 2, coord[1] + 2, f"J{j}", fontsize=9, color='black')
 
-# Stäbe zeichnen
-for rod in rods:
-    j1, j2 = rod
-    p1, p2 = joints[j1], joints[j2]
-    ax.plot([p1[0], p2[0]], [p1[1], p2[1]], 'k-', lw=2)
+# Stäbe zeichnen, alle als eine Linie
+ax.plot(*rod_polyline(mech.positions, mech.rod_index), 'k-', lw=2)
 
 # Anzeige im Streamlit
 st.pyplot(fig)
 
+# Vorabprüfung: Freiheitsgrade, Verbindungen und montierbare Kurbelwinkel, bevor simuliert wird
+precheck = analyze_mechanism(mech)
+with st.expander("🔍 Vorabprüfung", expanded=bool(precheck["problems"] or precheck["warnings"])):
+    for problem in precheck["problems"]:
+        st.error(problem)
+    for warning in precheck["warnings"]:
+        st.warning(warning)
+    st.text(f"Freiheitsgrade nach Grübler: {precheck['gruebler']}, nach Jacobi-Rang: {precheck['dof']} "
+            f"(ohne Kurbel), montierbar: {precheck['feasible_fraction']:.0%} der Umdrehung")
+
 name = st.sidebar.text_input("Mechanismus Name")
 if st.sidebar.button("💾 Speichern"):
-    save_mechanism(mech, name)
+    try:
+        save_mechanism(mech, name)
+        st.sidebar.success(f" Mechanismus '{name}' gespeichert!")
+    except StorageError as e:
+        st.sidebar.error(str(e))
+
+
+
 
 
+playback = st.radio("Wiedergabe", ["Video (GIF/MP4)", "Im Browser (interaktiv, ohne Video)"], horizontal=True)
+video_format = st.radio("Videoformat", ["GIF", "MP4"], horizontal=True)
+frame_step = st.number_input("Nur jeden n-ten Frame speichern", min_value=1, max_value=10, value=1, step=1)
+adaptive = st.checkbox("Adaptive Schrittweite (weniger Lösungsschritte, interpolierte Frames)", value=False)
+crank_rpm = st.number_input("Kurbeldrehzahl für Geschwindigkeiten (U/min)", min_value=0.1, value=60.0, step=10.0)
 
+with st.expander("🦿 Mehrbeiniger Läufer"):
+    num_legs = st.number_input("Anzahl Beine an der Kurbelwelle (gleichmäßiger Phasenversatz)", min_value=1, max_value=12, value=1, step=1)
+    mirror_legs = st.checkbox("Jedes Bein zusätzlich an der Kurbelachse spiegeln", value=False)
+    leg_spacing = st.number_input("Versatz aufeinanderfolgender Beine in X (mm)", value=0.0, step=5.0)
 
+# Gelöst wird immer nur ein Bein, weitere Beine entstehen durch Phasenversatz und Spiegelung
+simulated = LegAssembly(mech, walker_legs(num_legs, mirror_legs, leg_spacing)) if num_legs > 1 or mirror_legs else mech
 
 if st.button("Simulation durchführen & GIF speichern"):
     
-    optimized_joints = mech.optimize_joints()
-    
-    if optimized_joints is None:
+    optimized_joints = None if precheck["problems"] else mech.solve_position()
+
+    if precheck["problems"]:
+        st.error(" Vorabprüfung fehlgeschlagen, Simulation wird nicht gestartet.")
+    elif optimized_joints is None:
         st.error(" Mechanismus ist kinematisch nicht lösbar oder Längenfehler erkannt!")
+    elif playback.startswith("Im Browser"):
+        # Der gelöste Zyklus geht einmal als Plotly-Animation an den Browser, der Server rendert keine Frames
+        positions, _, failures = default_cache.solve_cycle(simulated, adaptive=adaptive)
+        st.session_state.playback_figure = playback_figure(simulated, positions, failures, plot_size_x, plot_size_y)
+        st.session_state.job_id = None
     else:
-        
-        trajectory_data, gif_filename = simulate_mechanism(
-            mech, 
-            plot_size_x=plot_size_x,  
-            plot_size_y=plot_size_y,  
-            return_trajectory=True, 
-            save_gif=True
+        st.session_state.playback_figure = None
+        # Simulation läuft im Worker-Pool, die Sitzung merkt sich nur die Job-ID
+        st.session_state.job_id = submit_simulation(
+            simulated,
+            plot_size_x=plot_size_x,
+            plot_size_y=plot_size_y,
+            video_format=video_format.lower(),
+            frame_step=frame_step,
+            omega=crank_rpm * 2 * np.pi / 60,
+            adaptive=adaptive
         )
 
-        if trajectory_data:
-            
-            csv_data = {"Frame": []}
-            active_joints = [j for j in trajectory_data.keys() if mech.show_trajectory.get(j, False)]
-
-            for j in active_joints:
-                csv_data[f"Joint {j} X"] = []
-                csv_data[f"Joint {j} Y"] = []
-
-            num_frames = len(next(iter(trajectory_data.values())))
-
-            for frame in range(num_frames):
-                csv_data["Frame"].append(frame)
-                for j in active_joints:
-                    csv_data[f"Joint {j} X"].append(trajectory_data[j][frame][0])
-                    csv_data[f"Joint {j} Y"].append(trajectory_data[j][frame][1])
-
-            
-            csv_filename = "mechanism_trajectory.csv"
-            df = pd.DataFrame(csv_data)
-            df.to_csv(csv_filename, index=False)
-
-            with open(csv_filename, "rb") as f:
-                st.download_button("Bahnkurven als CSV herunterladen", f, file_name=csv_filename, mime="text/csv")
-
-        if gif_filename:
-           
-            st.image(gif_filename)
-
-           
-            with open(gif_filename, "rb") as f:
-                st.download_button("🎥 Simulation als GIF herunterladen", f, file_name=gif_filename, mime="image/gif")
\ No newline at end of file
+if st.session_state.get("playback_figure") is not None:
+    st.plotly_chart(st.session_state.playback_figure)
+
+
+@st.fragment(run_every=0.5)
+def show_job_progress(job):
+    """ Fragt den Fortschritt eines laufenden Jobs ab, ohne das ganze Skript neu auszuführen.
+
+    Sobald der Job fertig ist, wird die Seite einmal neu aufgebaut; das Ergebnis zeigt dann
+    show_job_result, und die Abfrage endet.
+    """
+    if job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"Simulation läuft ... {job.progress:.0%}")
+    if job.preview is not None:
+        # Übertragung an den Browser; gemessen nur für die Frames, die die Abfrage tatsächlich zeigt
+        frame, image = job.preview
+        with job.trace.timed(frame, "transmit"):
+            st.image(image)
+    if st.button("⏹ Abbrechen"):
+        cancel_job(job.job_id)
+
+
+def show_job_result(job):
+    """ Zeigt Ergebnis, Zeitaufschlüsselung und Downloads eines abgeschlossenen Jobs. """
+    if job.status == "abgebrochen":
+        st.warning("Simulation abgebrochen.")
+        return
+    if job.status == "fehler":
+        st.error(f"Simulation fehlgeschlagen: {job.error}")
+        return
+
+    with st.expander("⏱ Zeitaufschlüsselung pro Frame"):
+        summary = job.trace.summary()
+        if len(summary) > 1:
+            st.dataframe(pd.DataFrame(summary).T)
+        else:
+            st.info("Ergebnis aus dem Cache, keine neuen Messwerte.")
+        if job.trace_filenames:
+            trace_json, trace_csv = job.trace_filenames
+            with open(trace_json, "rb") as f:
+                st.download_button("Trace als JSON herunterladen", f, file_name="simulation_trace.json", mime="application/json")
+            with open(trace_csv, "rb") as f:
+                st.download_button("Trace als CSV herunterladen", f, file_name="simulation_trace.csv", mime="text/csv")
+
+    if job.csv_filename:
+        with open(job.csv_filename, "rb") as f:
+            st.download_button("Bahnkurven als CSV herunterladen", f, file_name="mechanism_trajectory.csv", mime="text/csv")
+
+    if job.binary_filename:
+        with open(job.binary_filename, "rb") as f:
+            st.download_button("Bahnkurven binär (.mtrj) herunterladen", f, file_name="mechanism_trajectory.mtrj", mime="application/octet-stream")
+
+    if job.video_filename:
+        if job.video_fallback:
+            st.info("Kein H.264-Encoder verfügbar (imageio[ffmpeg] installieren), das Video wurde als GIF gespeichert.")
+        is_gif = job.video_filename.endswith(".gif")
+        if is_gif:
+            st.image(job.video_filename)
+        else:
+            st.video(job.video_filename)
+
+        mime = "image/gif" if is_gif else "video/mp4"
+        file_name = "mechanism_simulation.gif" if is_gif else "mechanism_simulation.mp4"
+        with open(job.video_filename, "rb") as f:
+            st.download_button(f"🎥 Simulation als {'GIF' if is_gif else 'MP4'} herunterladen", f, file_name=file_name, mime=mime)
+
+
+simulation_job = get_job(st.session_state.get("job_id"))
+if simulation_job is not None:
+    if simulation_job.done:
+        show_job_result(simulation_job)
+    else:
+        show_job_progress(simulation_job)
+
+
+with st.expander("💥 Kollisionsprüfung"):
+    clearance = st.number_input("Mindestabstand zwischen Stäben (mm)", min_value=0.0, value=1.0, step=0.5)
+    if st.button("Kollisionen prüfen"):
+        if precheck["problems"]:
+            st.error(" Vorabprüfung fehlgeschlagen, Kollisionsprüfung wird nicht gestartet.")
+        else:
+            # Geprüft wird ein Bein, die Beine eines mehrbeinigen Läufers liegen in verschiedenen Ebenen
+            positions, _, failures = default_cache.solve_cycle(mech)
+            interference, interference_rows = rod_interference(mech, positions, failures, clearance)
+            if interference["interferes"]:
+                st.error(f"Stäbe kreuzen sich oder unterschreiten den Mindestabstand ab {interference['first_angle']:.1f}° Kurbelwinkel.")
+            else:
+                st.success("Keine Kollision über die ganze Umdrehung.")
+            st.dataframe(pd.DataFrame(interference_rows).rename(columns={
+                "rod_a": "Stab A", "rod_b": "Stab B", "min_clearance": "Mindestabstand (mm)",
+                "exact": "exakt (sonst untere Schranke)", "min_angle": "bei Winkel (°)",
+                "first_interference_angle": "Kollision ab (°)",
+            }))
+
+
+st.header("Mechanismen vergleichen")
+compare_names = st.multiselect("Gespeicherte Mechanismen gleicher Topologie", saved_mechanisms)
+if compare_names:
+    try:
+        compared = [load_mechanism(compare_name) for compare_name in compare_names]
+        batch = MechanismBatch(compared)
+    except (StorageError, ValueError) as e:
+        st.error(str(e))
+    else:
+        compare_joint = st.selectbox("Verglichenes Gelenk (Fußpunkt)", batch.joint_ids, index=len(batch.joint_ids) - 1)
+        if st.button("Vergleichen"):
+            # Alle Mechanismen werden in einem gemeinsamen, vektorisierten Durchlauf gelöst
+            compare_positions, _, compare_failures = batch.solve_cycle(steps=180)
+            paths = batch.joint_paths(compare_positions, compare_joint)
+            st.pyplot(foot_path_figure(paths, compare_names, plot_size_x, plot_size_y))
+            metrics = pd.DataFrame([foot_path_metrics(path) for path in paths], index=compare_names)
+            metrics["failed_frames"] = compare_failures.sum(axis=0)
+            st.dataframe(metrics)
@@ -1,58 +1,490 @@
+from collections.abc import MutableMapping
+
 import numpy as np
-from scipy.optimize import minimize
+import components
+from dyads import build_dyad_plan, solve_dyads
+
+
+class JointView(MutableMapping):
+    """ Dict-artige Sicht {Gelenk-ID: (x, y)} auf das Positionsarray eines Mechanismus.
+
+    Lesen gibt eine Kopie der Zeile zurück, Schreiben ändert das Array. Gelenke hinzufügen
+    oder entfernen geht nicht; dafür wird ein neuer Mechanismus angelegt.
+    """
+    __slots__ = ("_mechanism",)
+
+    def __init__(self, mechanism):
+        self._mechanism = mechanism
+
+    def __getitem__(self, joint):
+        return self._mechanism.positions[self._mechanism.joint_index[joint]].copy()
+
+    def __setitem__(self, joint, position):
+        self._mechanism.positions[self._mechanism.joint_index[joint]] = position
+
+    def __delitem__(self, joint):
+        raise TypeError("Gelenke eines Mechanismus können nicht entfernt werden.")
+
+    def __iter__(self):
+        return iter(self._mechanism.joint_ids)
+
+    def __len__(self):
+        return len(self._mechanism.joint_ids)
+
 
 class Mechanism:
-    def init(self, fixed_point, radius, start_angle, speed, joints, fixed_joints, rods):
-        self.fixed_point = np.array(fixed_point)
+    """ Kompiliertes Mechanismus-Modell.
+
+    Alle Gelenklagen liegen in einem zusammenhängenden (N x 2)-Array positions in der
+    Reihenfolge von joint_ids, die Stäbe als Indexpaare rod_index mit Solllängen
+    rod_lengths, feste Gelenke als Maske fixed_mask. joints, rods, fixed_joints und
+    initial_lengths sind Sichten im alten Dict-/Listenformat für bestehende Aufrufer.
+    """
+    __slots__ = (
+        "fixed_point", "radius", "theta", "speed", "joint_ids", "joint_index", "positions", "crank",
+        "_rods", "rod_index", "rod_lengths", "fixed_mask", "moving_mask", "moving_joints", "moving_column",
+        "dyad_plan", "unresolved_joints", "solve_stages", "verbose", "last_solve", "last_cycle_stats", "show_trajectory",
+    )
+
+    def __init__(self, fixed_point, radius, start_angle, speed, joints, fixed_joints, rods):
+        self.fixed_point = np.array(fixed_point, dtype=float)
         self.radius = radius
         self.theta = np.radians(start_angle)
         self.speed = np.radians(speed)
-        self.joints = {int(k): np.array(v) for k, v in joints.items()}
-        self.fixed_joints = set(fixed_joints)
-        self.rods = rods
-        self.initial_lengths = self.calculate_lengths()
+        self.joint_ids = [int(k) for k in joints]
+        self.joint_index = {j: i for i, j in enumerate(self.joint_ids)}
+        if 2 not in self.joint_index:
+            raise ValueError("Gelenk 2 (Kurbel) fehlt.")
+        self.crank = self.joint_index[2]
+        self.positions = np.array([np.asarray(v, dtype=float) for v in joints.values()], dtype=float).reshape(-1, 2)
+        fixed_joints = {int(j) for j in fixed_joints}
+        self.fixed_mask = np.array([j in fixed_joints for j in self.joint_ids], dtype=bool)
+        self._rods = [(int(j1), int(j2)) for j1, j2 in rods]
+        self.rod_index = np.array([(self.joint_index[j1], self.joint_index[j2]) for j1, j2 in self._rods], dtype=int).reshape(-1, 2)
+        self.rod_lengths = self.current_lengths()
+        self.verbose = True
+        self.last_solve = {}
+        self.last_cycle_stats = {}
+        self.show_trajectory = {}
+        self.compile_topology()
+
+    @property
+    def joints(self):
+        return JointView(self)
+
+    @joints.setter
+    def joints(self, joints):
+        for j, position in joints.items():
+            self.positions[self.joint_index[j]] = position
+
+    @property
+    def rods(self):
+        return self._rods
+
+    @property
+    def fixed_joints(self):
+        return {j for j, fixed in zip(self.joint_ids, self.fixed_mask) if fixed}
+
+    @property
+    def initial_lengths(self):
+        return dict(zip(self._rods, self.rod_lengths.tolist()))
 
     def compute_gelenk_2(self):
         return self.fixed_point + self.radius * np.array([np.cos(self.theta), np.sin(self.theta)])
 
+    def current_lengths(self, positions=None):
+        """ Stablängen in der aktuellen (oder der übergebenen) Stellung als Array in der Reihenfolge von rods. """
+        positions = self.positions if positions is None else positions
+        delta = positions[self.rod_index[:, 0]] - positions[self.rod_index[:, 1]]
+        return np.hypot(delta[:, 0], delta[:, 1])
+
     def calculate_lengths(self):
-        """ Berechnet die Anfangslängen der Stäbe und speichert sie. """
-        return {pair: np.linalg.norm(self.joints[pair[0]] - self.joints[pair[1]]) for pair in self.rods}
+        """ Aktuelle Stablängen als Dict {(j1, j2): Länge}. """
+        return dict(zip(self._rods, self.current_lengths().tolist()))
+
+    def compile_topology(self):
+        """ Leitet aus Stäben, Solllängen und fester Maske die Lösungspläne ab. Nach Änderungen an rod_lengths erneut aufrufen. """
+        self.moving_mask = ~self.fixed_mask
+        self.moving_mask[self.crank] = False
+        self.moving_joints = [j for j, moving in zip(self.joint_ids, self.moving_mask) if moving]
+        # Spaltenindex jedes Gelenks im Unbekanntenvektor, -1 für feste Gelenke
+        self.moving_column = np.full(len(self.joint_ids), -1, dtype=int)
+        self.moving_column[self.moving_mask] = np.arange(np.count_nonzero(self.moving_mask))
+        known_joints = [j for j, moving in zip(self.joint_ids, self.moving_mask) if not moving]
+        self.dyad_plan, self.unresolved_joints = build_dyad_plan(self.joint_ids, known_joints, self._rods, self.rod_lengths)
+        # Nicht zerlegbare Reste werden in unabhängige Teilsysteme aufgeteilt und in Abhängigkeitsreihenfolge gelöst
+        if self.unresolved_joints:
+            self.solve_stages = components.build_solve_plan(self.joint_ids, known_joints, self._rods, self.rod_lengths)
+        else:
+            self.solve_stages = [("dyads", self.dyad_plan)]
+
+    def joint_positions(self):
+        """ Gibt eine Kopie der aktuellen Gelenkpositionen als (N x 2)-Array in der Reihenfolge von joint_ids zurück. """
+        return self.positions.copy()
+
+    def rod_residuals(self, x, positions):
+        """ Längenabweichung aller Stäbe für den Unbekanntenvektor x der beweglichen Gelenke. """
+        positions[self.moving_mask] = x.reshape(-1, 2)
+        delta = positions[self.rod_index[:, 0]] - positions[self.rod_index[:, 1]]
+        return np.hypot(delta[:, 0], delta[:, 1]) - self.rod_lengths
+
+    def rod_jacobian(self, x, positions, sparse=False):
+        """ Exakte Jacobi-Matrix der Stabresiduen nach den Koordinaten der beweglichen Gelenke, optional dünn besetzt. """
+        positions[self.moving_mask] = x.reshape(-1, 2)
+        return components.rod_jacobian(positions, self.rod_index, self.moving_column, x.size, sparse)
+
+    def sparse_rod_jacobian(self, x, positions):
+        return self.rod_jacobian(x, positions, sparse=True)
+
+    def report_failure(self, message):
+        """ Hält die Fehlermeldung des letzten Lösungsversuchs fest und gibt sie bei verbose aus. """
+        self.last_solve["message"] = message
+        if self.verbose:
+            print(message)
+        return None
+
+    def solve_position(self):
+        """ Löst die Gelenkpositionen schrittweise: Dyaden geschlossen, nicht zerlegbare Kerne als kleine Teilsysteme.
+
+        Wenn ein Teilsystem nicht konvergiert (z.B. ungünstig gewählter Kern) oder danach noch
+        Längenfehler bleiben (überzählige Stäbe), geht der ganze Mechanismus an optimize_joints.
+        """
+        self.last_solve = {"method": "dyaden", "nfev": 0, "njev": 0, "message": ""}
+        if not self.moving_joints:
+            return None
+
+        positions = self.positions.copy()
+        for stage in self.solve_stages:
+            if stage[0] == "dyads":
+                if not solve_dyads(stage[1], positions):
+                    return self.report_failure("Dyade nicht schließbar! Mechanismus ist in dieser Stellung nicht lösbar.")
+            elif not self.solve_cluster(positions, stage[1], stage[2]):
+                # Gesamtoptimierung über alle Unbekannten, ausgehend vom bisher Gelösten
+                self.positions[self.moving_mask] = positions[self.moving_mask]
+                return self.optimize_joints()
+
+        self.positions[self.moving_mask] = positions[self.moving_mask]
+
+        # Überzählige Stäbe: die schrittweise Lösung dient als Startwert für den Optimierer
+        residuals = self.rod_residuals(positions[self.moving_mask].ravel(), positions)
+        if np.abs(residuals).max(initial=0.0) > 1e-5:
+            return self.optimize_joints()
+        return self.joints
+
+    def solve_cluster(self, positions, joints, rods):
+        """ Löst die Gelenke eines nicht zerlegbaren Kerns bei bekannter Umgebung (Indizes in joint_ids bzw. rods).
+
+        Die Unbekannten sind nur die Koordinaten dieser Gelenke, die Residuen nur die
+        angrenzenden Stäbe. Große Kerne werden mit dünn besetzter Jacobi-Matrix gelöst.
+        positions wird bei Erfolg überschrieben.
+        """
+        rod_index, lengths = self.rod_index[rods], self.rod_lengths[rods]
+        columns = np.full(len(self.joint_ids), -1, dtype=int)
+        columns[joints] = np.arange(len(joints))
+        local = positions.copy()
+
+        def residuals(x):
+            local[joints] = x.reshape(-1, 2)
+            delta = local[rod_index[:, 0]] - local[rod_index[:, 1]]
+            return np.hypot(delta[:, 0], delta[:, 1]) - lengths
+
+        def jacobian(x, sparse):
+            local[joints] = x.reshape(-1, 2)
+            return components.rod_jacobian(local, rod_index, columns, 2 * len(joints), sparse)
+
+        initial_guess = positions[joints].ravel()
+        if initial_guess.size > components.SPARSE_UNKNOWNS:
+            x = self._sparse_levenberg_marquardt(residuals, lambda x: jacobian(x, True), initial_guess)
+            if x is None:
+                return False
+            positions[joints] = x.reshape(-1, 2)
+            return True
+
+        # Kleine Kerne: wenige Gauß-Newton-Schritte vom Vorgängerframe aus genügen meist
+        self.last_solve["method"] = "teilsysteme"
+        if len(rods) >= initial_guess.size:
+            x = initial_guess.copy()
+            for iteration in range(1, 11):
+                error = residuals(x)
+                if np.abs(error).max(initial=0.0) <= 1e-10:
+                    self.last_solve["nfev"] += iteration
+                    positions[joints] = x.reshape(-1, 2)
+                    return True
+                x = x - np.linalg.lstsq(jacobian(x, False), error, rcond=None)[0]
+
+        from scipy.optimize import least_squares
+        method = "lm" if len(rods) >= initial_guess.size else "trf"
+        result = least_squares(residuals, initial_guess, jac=lambda x: jacobian(x, False), method=method, xtol=1e-12, ftol=1e-12)
+        self.last_solve["nfev"] += int(result.nfev)
+        self.last_solve["njev"] += int(result.njev or 0)
+
+        if not result.success or np.abs(result.fun).max(initial=0.0) > 1e-5:
+            return False
+        positions[joints] = result.x.reshape(-1, 2)
+        return True
+
+    def _sparse_levenberg_marquardt(self, residuals, jacobian, x, max_iterations=50, tolerance=1e-10):
+        """ Gedämpftes Gauß-Newton mit dünn besetzten Normalgleichungen. Gibt die Lösung oder None zurück. """
+        from scipy.sparse import identity
+        from scipy.sparse.linalg import spsolve
+
+        error = residuals(x)
+        cost, damping = error @ error, 1e-3
+        self.last_solve["method"] = "teilsysteme (dünn besetzt)"
+        for iteration in range(1, max_iterations + 1):
+            if np.abs(error).max(initial=0.0) <= tolerance:
+                break
+            jac = jacobian(x)
+            normal = (jac.T @ jac).tocsc()
+            scale = max(normal.diagonal().max(initial=0.0), 1.0)
+            step = spsolve(normal + damping * scale * identity(x.size, format="csc"), -(jac.T @ error))
+            trial = x + step
+            trial_error = residuals(trial)
+            if trial_error @ trial_error < cost:
+                x, error, cost = trial, trial_error, trial_error @ trial_error
+                damping = max(damping / 10, 1e-12)
+            else:
+                damping *= 10
+                if damping > 1e8:
+                    break
+        self.last_solve["nfev"] += iteration
+        self.last_solve["njev"] += iteration
+        return x if np.abs(error).max(initial=0.0) <= 1e-5 else None
+
+    def cycle_angles(self, steps=None):
+        """ Kurbelwinkel aller Frames einer vollen Umdrehung ab der aktuellen Stellung. Ohne steps wird in speed-Schritten gerechnet. """
+        if steps is None:
+            steps = int(np.ceil(2 * np.pi / self.speed - 1e-9))
+            step = self.speed
+        else:
+            step = 2 * np.pi / steps
+        return self.theta + step * np.arange(1, steps + 1)
+
+    def solve_cycle(self, steps=None, trace=None):
+        """ Löst eine volle Kurbelumdrehung ohne Darstellung, jeder Frame startet bei der Lösung des vorherigen.
+
+        Gibt (positions, residuals, failures) zurück: ein (Frames x Gelenke x 2)-Array in der
+        Reihenfolge von joint_ids (NaN für nicht lösbare Frames), die maximale Längenabweichung
+        je Frame und eine Maske der fehlgeschlagenen Frames. Winkel und Gelenke werden danach
+        wiederhergestellt. Mit einem FrameTrace werden Lösezeit und Solver-Kennzahlen je Frame erfasst.
+        """
+        angles = self.cycle_angles(steps)
+        start_theta, start_positions = self.theta, self.positions.copy()
+        positions = np.full((len(angles), len(self.joint_ids), 2), np.nan)
+        residuals = np.full(len(angles), np.nan)
+        failures = np.zeros(len(angles), dtype=bool)
+
+        last_solved = self.positions.copy()
+        for frame, theta in enumerate(angles):
+            self.theta = theta
+            self.positions[self.crank] = self.compute_gelenk_2()
+            if trace is None:
+                solved = self.solve_position()
+            else:
+                with trace.timed(frame, "solve"):
+                    solved = self.solve_position()
+                trace.add(frame, theta=float(np.degrees(theta)), success=solved is not None, **self.last_solve)
+            if solved is None:
+                failures[frame] = True
+                self.positions[:] = last_solved
+                continue
+            positions[frame] = self.positions
+            residuals[frame] = np.abs(self.current_lengths() - self.rod_lengths).max(initial=0.0)
+            if trace is not None:
+                trace.add(frame, residual=float(residuals[frame]))
+            last_solved[:] = self.positions
+
+        self.theta, self.positions[:] = start_theta, start_positions
+        return positions, residuals, failures
+
+    def solve_cycle_adaptive(self, steps=None, tolerance=0.01, min_step=np.radians(0.05), max_step=np.radians(20), trace=None):
+        """ Löst eine volle Kurbelumdrehung mit adaptiver Schrittweite und interpoliert auf die Ausgabeframes.
+
+        Jeder Schritt wird aus der analytischen Geschwindigkeit vorhergesagt. Die Abweichung
+        zwischen Vorhersage und Lösung (relativ zur längsten Stange) steuert die Schrittweite:
+        in ruhigen Bereichen wächst sie, nahe Strecklagen oder bei Fehlschlägen schrumpft sie.
+        Die Vorhersage dient zugleich als Startwert, damit die Dyaden nicht den Ast wechseln.
+        Die Ausgabe wird per kubischer Hermite-Interpolation an den Winkeln von
+        cycle_angles(steps) erzeugt und hat dieselbe Form wie bei solve_cycle. Mit einem FrameTrace
+        wird jeder Löseraufruf (auch verworfene Schritte) dem ersten Ausgabeframe ab seinem Winkel
+        zugerechnet; die Lösezeiten summieren sich dort, die Kennzahlen stammen vom letzten Aufruf.
+        """
+        angles = self.cycle_angles(steps)
+        start_theta, start_positions = self.theta, self.positions.copy()
+        end_theta = start_theta + 2 * np.pi
+        limit = tolerance * max(self.rod_lengths.max(initial=0.0), self.radius)
+
+        current = self.joint_positions()
+        velocity = self.joint_derivatives(current, start_theta)[0]
+        knots = [(start_theta, current, velocity)]
+        gaps = []
+        theta, step, solver_calls, in_gap = start_theta, np.radians(2), 0, False
+        while theta < end_theta - 1e-12:
+            step = min(step, end_theta - theta)
+            predicted = current + step * velocity if not np.isnan(velocity).any() else current
+            self.positions[self.moving_mask] = predicted[self.moving_mask]
+            self.theta = theta + step
+            self.positions[self.crank] = self.compute_gelenk_2()
+            if trace is None:
+                solved = self.solve_position() is not None
+            else:
+                frame = min(np.searchsorted(angles, self.theta - 1e-12), len(angles) - 1)
+                with trace.timed(frame, "solve"):
+                    solved = self.solve_position() is not None
+                trace.add(frame, theta=float(np.degrees(self.theta)), success=solved, **self.last_solve)
+            solver_calls += 1
+            error = np.abs(self.positions - predicted).max() if solved else np.inf
+
+            if solved and (error <= limit or step <= min_step) and (not in_gap or step <= min_step):
+                theta, current, in_gap = theta + step, self.joint_positions(), False
+                velocity = self.joint_derivatives(current, theta)[0]
+                knots.append((theta, current, velocity))
+                step = min(max_step, step * min(2.0, 0.9 * np.sqrt(limit / max(error, 1e-12))))
+                continue
+            if not solved and (in_gap or step <= min_step):
+                # Nicht lösbarer Bereich: mit wachsender Schrittweite überspringen,
+                # beim nächsten Erfolg wird der Wiedereintritt per Halbierung eingegrenzt
+                gaps.append((theta, theta + step))
+                theta, in_gap = theta + step, True
+                velocity = np.full_like(velocity, np.nan)
+                step = min(max_step, 2 * step)
+                continue
+            self.positions[self.moving_mask] = current[self.moving_mask]
+            step = max(min_step, step / 2)
+
+        self.theta, self.positions[:] = start_theta, start_positions
+        self.last_cycle_stats = {"solver_calls": solver_calls, "knots": len(knots), "gaps": len(gaps)}
+        return self._interpolate_knots(knots, gaps, angles)
+
+    def _interpolate_knots(self, knots, gaps, angles):
+        knot_angles = np.array([k[0] for k in knots])
+        knot_positions = np.array([k[1] for k in knots])
+        knot_velocities = np.array([k[2] for k in knots])
+
+        segment = np.clip(np.searchsorted(knot_angles, angles, side="right") - 1, 0, len(knots) - 2)
+        width = knot_angles[segment + 1] - knot_angles[segment]
+        t = ((angles - knot_angles[segment]) / width)[:, None, None]
+        h00, h10 = 2 * t ** 3 - 3 * t ** 2 + 1, t ** 3 - 2 * t ** 2 + t
+        h01, h11 = -2 * t ** 3 + 3 * t ** 2, t ** 3 - t ** 2
+        w = width[:, None, None]
+        positions = (h00 * knot_positions[segment] + h10 * w * knot_velocities[segment]
+                     + h01 * knot_positions[segment + 1] + h11 * w * knot_velocities[segment + 1])
+
+        failures = np.isnan(positions).any(axis=(1, 2))
+        for low, high in gaps:
+            failures |= (angles > low) & (angles < high)
+        positions[failures] = np.nan
+
+        residuals = np.full(len(angles), np.nan)
+        for frame in np.flatnonzero(~failures):
+            residuals[frame] = np.abs(self.current_lengths(positions[frame]) - self.rod_lengths).max(initial=0.0)
+        return positions, residuals, failures
+
+    def joint_derivatives(self, positions, theta, omega=1.0):
+        """ Geschwindigkeiten und Beschleunigungen aller Gelenke in einer gelösten Stellung.
+
+        Aus der Zeitableitung der Stabbedingungen folgt J v = b_v und J a = b_a mit derselben
+        Jacobi-Matrix J; sie wird einmal QR-faktorisiert (bei großen Mechanismen J^T J dünn
+        besetzt LU-faktorisiert) und für beide rechten Seiten benutzt.
+        Die Kurbel dreht mit konstanter Winkelgeschwindigkeit omega (rad/s); mit omega=1 sind
+        es Ableitungen nach dem Kurbelwinkel. Gibt zwei (N x 2)-Arrays zurück, NaN in
+        singulären Stellungen.
+        """
+        positions = np.asarray(positions, dtype=float)
+        velocities = np.zeros_like(positions)
+        accelerations = np.zeros_like(positions)
+        crank = self.crank
+        direction = np.array([np.cos(theta), np.sin(theta)])
+        velocities[crank] = self.radius * omega * np.array([-direction[1], direction[0]])
+        accelerations[crank] = -self.radius * omega ** 2 * direction
+        if not self.moving_joints:
+            return velocities, accelerations
+
+        a, b = self.rod_index[:, 0], self.rod_index[:, 1]
+        delta = positions[a] - positions[b]
+        length = np.hypot(delta[:, 0], delta[:, 1])
+        unit = delta / np.where(length > 0, length, 1.0)[:, None]
+        x = positions[self.moving_mask].ravel()
+        solve = self._sparse_solver(x, positions) if x.size > components.SPARSE_UNKNOWNS else self._dense_solver(x, positions)
+        if solve is None:
+            velocities[self.moving_mask] = np.nan
+            accelerations[self.moving_mask] = np.nan
+            return velocities, accelerations
+
+        # Bekannte Gelenke (Kurbel) stehen auf der rechten Seite, bewegliche sind hier noch null
+        rhs = -np.einsum("ij,ij->i", unit, velocities[a] - velocities[b])
+        velocities[self.moving_mask] = solve(rhs).reshape(-1, 2)
+
+        relative = velocities[a] - velocities[b]
+        rhs = -np.einsum("ij,ij->i", unit, accelerations[a] - accelerations[b])
+        rhs -= np.einsum("ij,ij->i", relative, relative) / np.where(length > 0, length, 1.0)
+        accelerations[self.moving_mask] = solve(rhs).reshape(-1, 2)
+        return velocities, accelerations
+
+    def _dense_solver(self, x, positions):
+        jacobian = self.rod_jacobian(x, positions.copy())
+        q, r = np.linalg.qr(jacobian)
+        if jacobian.shape[0] < jacobian.shape[1] or np.abs(np.diag(r)).min() < 1e-10 * max(np.abs(r).max(), 1.0):
+            return None
+        return lambda rhs: np.linalg.solve(r, q.T @ rhs)
+
+    def _sparse_solver(self, x, positions):
+        from scipy.sparse.linalg import splu
+
+        jacobian = self.rod_jacobian(x, positions.copy(), sparse=True)
+        if jacobian.shape[0] < jacobian.shape[1]:
+            return None
+        try:
+            factor = splu((jacobian.T @ jacobian).tocsc())
+        except RuntimeError:
+            return None
+        if np.abs(factor.U.diagonal()).min() < 1e-12 * max(np.abs(factor.U.diagonal()).max(), 1.0):
+            return None
+        return lambda rhs: factor.solve(jacobian.T @ rhs)
+
+    def cycle_derivatives(self, positions, omega=1.0, steps=None):
+        """ Geschwindigkeiten und Beschleunigungen für alle Frames eines mit solve_cycle gelösten Zyklus. """
+        velocities = np.full_like(positions, np.nan)
+        accelerations = np.full_like(positions, np.nan)
+        for frame, theta in enumerate(self.cycle_angles(steps)):
+            if not np.isnan(positions[frame]).any():
+                velocities[frame], accelerations[frame] = self.joint_derivatives(positions[frame], theta, omega)
+        return velocities, accelerations
 
     def optimize_joints(self):
         """ Optimiert die Gelenkpositionen, um die Stablängen zu erhalten. Falls nicht lösbar, gibt es eine Fehlermeldung. """
-        moving_joints = [j for j in self.joints if j not in self.fixed_joints and j != 2]
-        if not moving_joints:
+        if not self.moving_joints:
             return None
+        # scipy erst bei Bedarf laden, reine Dyaden-Mechanismen kommen ohne aus
+        from scipy.optimize import least_squares
+
+        positions = self.positions.copy()
+        initial_guess = positions[self.moving_mask].ravel()
+        if initial_guess.size > components.SPARSE_UNKNOWNS:
+            # Große Mechanismen: dünn besetzte Jacobi-Matrix und Normalgleichungen
+            self.last_solve = {"method": "", "nfev": 0, "njev": 0, "message": ""}
+            solution = self._sparse_levenberg_marquardt(
+                lambda x: self.rod_residuals(x, positions), lambda x: self.sparse_rod_jacobian(x, positions), initial_guess
+            )
+            success = solution is not None
+        else:
+            # Levenberg-Marquardt braucht mindestens so viele Residuen wie Unbekannte
+            method = "lm" if len(self.rod_index) >= initial_guess.size else "trf"
+            result = least_squares(
+                self.rod_residuals, initial_guess, jac=self.rod_jacobian, args=(positions,),
+                method=method, xtol=1e-12, ftol=1e-12
+            )
+            self.last_solve = {"method": method, "nfev": int(result.nfev), "njev": int(result.njev or 0), "message": ""}
+            success, solution = result.success, result.x
+
+        if success:
+            self.positions[self.moving_mask] = solution.reshape(-1, 2)
 
-        def error_function(p_guess):
-            """ Fehlerfunktion zur Minimierung der Längenabweichung der Stäbe. """
-            error = 0
-            positions = {j: p_guess[i*2:i*2+2] for i, j in enumerate(moving_joints)}
-            for (j1, j2) in self.rods:
-                expected_length = self.initial_lengths[(j1, j2)]
-                actual_length = np.linalg.norm(
-                    positions.get(j1, self.joints[j1]) - positions.get(j2, self.joints[j2])
-                )
-                error += (actual_length - expected_length) ** 2
-            return error
-
-        initial_guess = np.concatenate([self.joints[j] for j in moving_joints])
-        result = minimize(error_function, initial_guess, method="BFGS")
-
-        if result.success:
-            optimized_positions = result.x.reshape(-1, 2)
-            for i, j in enumerate(moving_joints):
-                self.joints[j] = optimized_positions[i]
-
-            
-            new_lengths = self.calculate_lengths()
-            for (j1, j2), length in self.initial_lengths.items():
-                if not np.isclose(new_lengths[(j1, j2)], length, atol=1e-5):
-                    print(f"⚠ Längenfehler erkannt: Stab {j1}-{j2} hat sich verändert!")
-                    return None  
+            changed = np.flatnonzero(~np.isclose(self.current_lengths(), self.rod_lengths, atol=1e-5))
+            if len(changed):
+                j1, j2 = self._rods[changed[0]]
+                return self.report_failure(f"⚠ Längenfehler erkannt: Stab {j1}-{j2} hat sich verändert!")
 
             return self.joints
         else:
-            print("Optimierung fehlgeschlagen! Mechanismus ist kinematisch nicht lösbar.")
-            return None
\ No newline at end of file
+            return self.report_failure("Optimierung fehlgeschlagen! Mechanismus ist kinematisch nicht lösbar.")
@@ -1,102 +1,178 @@
 import numpy as np
-import time
-import matplotlib.pyplot as plt
-import streamlit as st
-import pandas as pd
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from PIL import Image
+from encoder import FrameEncoder
 
 
-def simulate_mechanism(mechanism, plot_size_x=100, plot_size_y=100, return_trajectory=False, save_gif=False):
-    
-    placeholder = st.empty()  
-    fig, ax = plt.subplots(figsize=(plot_size_x / 50, plot_size_y / 50))  
-    canvas = FigureCanvas(fig)  
+def rod_polyline(current, rod_index):
+    """ Alle Stäbe eines Frames als eine Linie, getrennt durch NaN-Lücken. """
+    segments = np.full((len(rod_index), 3, 2), np.nan)
+    segments[:, :2] = current[rod_index]
+    return segments[:, :, 0].ravel(), segments[:, :, 1].ravel()
 
-   
-    fig, ax = plt.subplots(figsize=(5, 5))
+
+def trajectory_paths(mechanism, positions, failures):
+    """ Gibt die Indizes der markierten Gelenke und ihre Bahnkurven über alle gelösten Frames zurück. """
+    traced = [k for k, j in enumerate(mechanism.joint_ids) if mechanism.show_trajectory.get(j, False)]
+    return traced, positions[~failures][:, traced]
+
+
+def render_frames(mechanism, positions, failures, plot_size_x=100, plot_size_y=100):
+    """ Zeichnet alle gelösten Frames und liefert sie nacheinander als RGBA-Array.
+
+    Das Array ist eine Sicht auf den Zeichenpuffer und wird beim nächsten Frame überschrieben.
+    Verwendet keine pyplot-Zustände und kann daher auch in Hintergrund-Threads laufen.
+    """
+    fig = Figure(figsize=(5, 5))
+    canvas = FigureCanvas(fig)
+    ax = fig.add_subplot()
+
+    # Statischer Hintergrund wird nur einmal gezeichnet
     ax.set_xlim([-plot_size_x / 2, plot_size_x / 2])
     ax.set_ylim([-plot_size_y / 2, plot_size_y / 2])
-
-   
     ax.set_xticks(np.linspace(-plot_size_x / 2, plot_size_x / 2, num=5))
     ax.set_yticks(np.linspace(-plot_size_y / 2, plot_size_y / 2, num=5))
-
-  
     ax.set_title(f"Simulation \nPlotgröße: X={plot_size_x}, Y={plot_size_y}", fontsize=12, fontweight="bold")
     ax.set_xlabel("X-Achse (mm)", fontsize=10)
     ax.set_ylabel("Y-Achse (mm)", fontsize=10)
-    ax.grid(True, linestyle="--", alpha=0.7)  
-
-
-    trajectory = {j: [] for j in mechanism.joints.keys() if mechanism.show_trajectory.get(j, False)}
-    initial_theta = mechanism.theta  
-
-    # GIF-Setup
-    gif_filename = "mechanism_simulation.gif"
-    frames = []  
-    
-
-    while mechanism.theta - initial_theta < 2 * np.pi:  
-        mechanism.theta += mechanism.speed  
-        mechanism.joints[2] = mechanism.compute_gelenk_2()  
-        optimized_joints = mechanism.optimize_joints()  
-
-        if optimized_joints:
-            ax.clear()
-            ax.set_xlim(-plot_size_x / 2, plot_size_x / 2)  
-            ax.set_ylim(-plot_size_y / 2, plot_size_y / 2)  
-            ax.set_xticks(np.linspace(-plot_size_x / 2, plot_size_x / 2, num=5))
-            ax.set_yticks(np.linspace(-plot_size_y / 2, plot_size_y / 2, num=5))
-
-            
-
-            
-            ax.set_title(f"Simulation \nPlotgröße: X={plot_size_x}, Y={plot_size_y}", fontsize=12, fontweight="bold")
-            ax.set_xlabel("X-Achse (mm)", fontsize=10)
-            ax.set_ylabel("Y-Achse (mm)", fontsize=10)
-            ax.grid(True, linestyle="--", alpha=0.7)
-
-           
-            for j, pos in mechanism.joints.items():
-                if mechanism.show_trajectory.get(j, False):
-                    trajectory[j].append(pos.copy())
-
-            
-            for (j1, j2) in mechanism.rods:
-                p1, p2 = mechanism.joints[j1], mechanism.joints[j2]
-                ax.plot([p1[0], p2[0]], [p1[1], p2[1]], 'bo-', markersize=5, linewidth=2)
-            
-          
-            for joint in mechanism.joints.values():
-                ax.scatter(joint[0], joint[1], color='r', zorder=3, s=50)
-
-            
-            for j, points in trajectory.items():
-                if len(points) > 1:
-                    points_np = np.array(points)
-                    ax.plot(points_np[:, 0], points_np[:, 1], 'r-', alpha=0.8)  
-            
-            
-            placeholder.pyplot(fig)
-
-            
-            if save_gif:
-                fig.canvas.draw()
-                buf = np.array(fig.canvas.renderer.buffer_rgba())
-                image = Image.fromarray(buf)
-                frames.append(image)
-
-    # Speichere GIF
-    if save_gif and frames:
-        frames[0].save(
-            gif_filename,
-            save_all=True,
-            append_images=frames[1:], 
-            duration=50,  
-            loop=0  
-        )
+    ax.grid(True, linestyle="--", alpha=0.7)
+
+    # Bahnkurven einmal vorab als zusammenhängendes Array, pro Frame nur ein Slice
+    traced, paths = trajectory_paths(mechanism, positions, failures)
+
+    # Dynamische Artists werden einmal angelegt und danach nur aktualisiert
+    rod_line, = ax.plot([], [], 'bo-', markersize=5, linewidth=2, animated=True)
+    joint_dots = ax.scatter(np.zeros(len(mechanism.joint_ids)), np.zeros(len(mechanism.joint_ids)), color='r', zorder=3, s=50, animated=True)
+    trajectory_lines = [ax.plot([], [], 'r-', alpha=0.8, animated=True)[0] for _ in traced]
+    dynamic_artists = trajectory_lines + [rod_line, joint_dots]
+
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+
+    for count, frame in enumerate(np.flatnonzero(~failures), start=1):
+        current = positions[frame]
+
+        rod_line.set_data(*rod_polyline(current, mechanism.rod_index))
+        joint_dots.set_offsets(current)
+        for i, line in enumerate(trajectory_lines):
+            line.set_data(paths[:count, i, 0], paths[:count, i, 1])
+
+        canvas.restore_region(background)
+        for artist in dynamic_artists:
+            ax.draw_artist(artist)
+        canvas.blit(fig.bbox)
+
+        yield np.asarray(canvas.buffer_rgba())
+
+
+def playback_figure(mechanism, positions, failures, plot_size_x=100, plot_size_y=100, fps=20):
+    """ Plotly-Animation eines gelösten Zyklus, die vollständig im Browser abläuft.
+
+    Stäbe und Gelenke werden als Frames übergeben, der Server rendert nichts. Der Schieberegler
+    erlaubt das Vorspulen, die Bahnkurven aller Gelenke lassen sich über die Legende ein- und
+    ausblenden; mit show_trajectory markierte Gelenke sind anfangs sichtbar.
+    """
+    import plotly.graph_objects as go
+
+    solved = np.flatnonzero(~failures)
+    positions = np.round(positions, 4)
+    show_trajectory = getattr(mechanism, "show_trajectory", {})
+    paths = positions[solved]
+
+    data = [
+        go.Scatter(x=paths[:, k, 0], y=paths[:, k, 1], mode="lines", name=f"Bahnkurve Gelenk {j}",
+                   line={"width": 1.5}, opacity=0.8, visible=True if show_trajectory.get(j, False) else "legendonly")
+        for k, j in enumerate(mechanism.joint_ids)
+    ]
+    # Nur diese beiden Traces ändern sich von Frame zu Frame
+    animated = [len(data), len(data) + 1]
+    first = positions[solved[0]] if len(solved) else mechanism.joint_positions()
+    x, y = rod_polyline(first, mechanism.rod_index)
+    data.append(go.Scatter(x=x, y=y, mode="lines", name="Stäbe", line={"color": "blue", "width": 2}, showlegend=False))
+    data.append(go.Scatter(x=first[:, 0], y=first[:, 1], mode="markers+text", name="Gelenke",
+                           text=[f"J{j}" for j in mechanism.joint_ids], textposition="top right",
+                           marker={"color": "red", "size": 8}, showlegend=False))
+
+    frames = []
+    for frame in solved:
+        x, y = rod_polyline(positions[frame], mechanism.rod_index)
+        frames.append(go.Frame(name=str(frame), traces=animated, data=[
+            go.Scatter(x=x, y=y), go.Scatter(x=positions[frame, :, 0], y=positions[frame, :, 1]),
+        ]))
+
+    duration = 1000 / fps
+    play = {"frame": {"duration": duration, "redraw": False}, "transition": {"duration": 0}, "fromcurrent": True, "mode": "immediate"}
+    pause = {"frame": {"duration": 0, "redraw": False}, "transition": {"duration": 0}, "mode": "immediate"}
+    fig = go.Figure(data=data, frames=frames)
+    fig.update_layout(
+        title=f"Simulation<br>Plotgröße: X={plot_size_x}, Y={plot_size_y}",
+        xaxis={"range": [-plot_size_x / 2, plot_size_x / 2], "title": "X-Achse (mm)"},
+        yaxis={"range": [-plot_size_y / 2, plot_size_y / 2], "title": "Y-Achse (mm)", "scaleanchor": "x"},
+        width=600, height=600,
+        updatemenus=[{"type": "buttons", "direction": "left", "x": 0, "y": -0.12, "xanchor": "left", "buttons": [
+            {"label": "▶ Abspielen", "method": "animate", "args": [None, play]},
+            {"label": "⏸ Pause", "method": "animate", "args": [[None], pause]},
+        ]}],
+        sliders=[{"active": 0, "y": -0.05, "currentvalue": {"prefix": "Frame "}, "steps": [
+            {"label": str(frame), "method": "animate", "args": [[str(frame)], pause]} for frame in solved
+        ]}],
+    )
+    return fig
+
+
+def foot_path_figure(paths, labels, plot_size_x=100, plot_size_y=100):
+    """ Überlagert die Bahnkurven mehrerer Mechanismen ((Batch x Frames x 2), NaN-Lücken erlaubt) in einem Diagramm. """
+    fig = Figure(figsize=(6, 5))
+    FigureCanvas(fig)
+    ax = fig.add_subplot()
+    ax.set_xlim([-plot_size_x / 2, plot_size_x / 2])
+    ax.set_ylim([-plot_size_y / 2, plot_size_y / 2])
+    ax.set_title("Vergleich der Bahnkurven", fontsize=12, fontweight="bold")
+    ax.set_xlabel("X-Achse (mm)", fontsize=10)
+    ax.set_ylabel("Y-Achse (mm)", fontsize=10)
+    ax.grid(True, linestyle="--", alpha=0.7)
+    for path, label in zip(paths, labels):
+        ax.plot(path[:, 0], path[:, 1], "-", linewidth=1.5, alpha=0.8, label=label)
+    if len(labels) <= 12:
+        ax.legend(fontsize=8, loc="upper right")
+    return fig
+
+
+def simulate_mechanism(mechanism, plot_size_x=100, plot_size_y=100, return_trajectory=False, save_gif=False,
+                       video_filename="mechanism_simulation.gif", frame_step=1, trace=None):
+    import streamlit as st
+
+    placeholder = st.empty()
+    positions, residuals, failures = mechanism.solve_cycle(trace=trace)
+
+    # Frames werden direkt beim Erzeugen geschrieben (GIF oder MP4 je nach Dateiendung)
+    encoder = FrameEncoder(video_filename, fps=20, frame_step=frame_step) if save_gif else None
+    try:
+        frames = render_frames(mechanism, positions, failures, plot_size_x, plot_size_y)
+        for frame in np.flatnonzero(~failures):
+            if trace is None:
+                buf = next(frames)
+                placeholder.image(buf)
+                if encoder is not None:
+                    encoder.append(buf)
+                continue
+
+            with trace.timed(frame, "draw"):
+                buf = next(frames)
+            with trace.timed(frame, "transmit"):
+                placeholder.image(buf)
+            if encoder is not None:
+                with trace.timed(frame, "encode"):
+                    encoder.append(buf)
+    finally:
+        if encoder is not None:
+            encoder.close()
+
+    # Ohne geschriebene Frames (alle Frames fehlgeschlagen) gibt es keine gültige Datei
+    video_filename = encoder.filename if encoder is not None and encoder.written else None
 
     if return_trajectory:
-        return trajectory, gif_filename
+        traced, paths = trajectory_paths(mechanism, positions, failures)
+        trajectory = {mechanism.joint_ids[k]: paths[:, i] for i, k in enumerate(traced)}
+        return trajectory, video_filename
     return None, None
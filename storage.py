@@ -1,61 +1,112 @@
-from tinydb import TinyDB, Query
+import json
+import os
+import sqlite3
+import threading
 import numpy as np
 from mechanism import Mechanism
-import streamlit as st
 
-db = TinyDB("mechanism_configurations.json")
+DB_FILENAME = "mechanism_configurations.db"
+LEGACY_JSON_FILENAME = "mechanism_configurations.json"
+
+_local = threading.local()
+
+
+class StorageError(Exception):
+    """ Fehler beim Speichern, Laden oder Löschen eines Mechanismus. Die Meldung ist für die Anzeige gedacht. """
+
+
+def _connect():
+    """ Gibt die SQLite-Verbindung des aktuellen Threads zurück und legt das Schema beim ersten Zugriff an. """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILENAME, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS mechanisms (name TEXT PRIMARY KEY, config TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        _migrate_legacy_json(conn)
+        _local.conn = conn
+    return conn
+
+
+def _migrate_legacy_json(conn):
+    """ Übernimmt einmalig alle Mechanismen aus der alten TinyDB-Datei. Bestehende Einträge bleiben unverändert. """
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_migrated'").fetchone():
+        return
+    entries = []
+    if os.path.exists(LEGACY_JSON_FILENAME):
+        with open(LEGACY_JSON_FILENAME, "r", encoding="utf-8") as f:
+            # TinyDB legt die Datei beim ersten Öffnen leer an
+            text = f.read().strip()
+        data = json.loads(text) if text else {}
+        for entry in data.get("_default", {}).values():
+            entry = dict(entry)
+            name = entry.pop("name", None)
+            if name:
+                entries.append((name, json.dumps(entry)))
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO mechanisms (name, config) VALUES (?, ?)", entries)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('legacy_json_migrated', ?)", (str(len(entries)),))
+
 
 def save_mechanism(mechanism, name):
     """Speichert oder aktualisiert einen Mechanismus in der Datenbank."""
-    if name:
-        db.upsert({
-            "name": name,
-            "fixed_point": mechanism.fixed_point.tolist(),
-            "radius": mechanism.radius,
-            "theta": np.degrees(mechanism.theta),
-            "speed": np.degrees(mechanism.speed),
-            "joints": {str(k): v.tolist() for k, v in mechanism.joints.items()}, 
-            "fixed_joints": list(mechanism.fixed_joints),  
-            "rods": [tuple(pair) for pair in mechanism.rods]  
-        }, Query().name == name)
-        st.sidebar.success(f" Mechanismus '{name}' gespeichert!")
-    else:
-        st.sidebar.error("⚠ Bitte einen gültigen Namen eingeben.")
+    if not name:
+        raise StorageError("⚠ Bitte einen gültigen Namen eingeben.")
+    config = {
+        "fixed_point": mechanism.fixed_point.tolist(),
+        "radius": mechanism.radius,
+        "theta": np.degrees(mechanism.theta),
+        "speed": np.degrees(mechanism.speed),
+        "joints": {str(j): p for j, p in zip(mechanism.joint_ids, mechanism.positions.tolist())},
+        "fixed_joints": [j for j, fixed in zip(mechanism.joint_ids, mechanism.fixed_mask.tolist()) if fixed],
+        "rods": [tuple(pair) for pair in mechanism.rods]
+    }
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "INSERT INTO mechanisms (name, config) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET config = excluded.config",
+            (name, json.dumps(config, default=lambda value: value.item()))
+        )
+
+def load_config(name):
+    """Gibt die gespeicherte Konfiguration eines Mechanismus als Dict zurück, im Format von save_mechanism."""
+    row = _connect().execute("SELECT config FROM mechanisms WHERE name = ?", (name,)).fetchone()
+    if not row:
+        raise StorageError(f"⚠ Mechanismus '{name}' nicht gefunden.")
+    try:
+        return json.loads(row[0])
+    except ValueError as e:
+        raise StorageError(f"Fehler beim Laden des Mechanismus: {e}") from e
 
 def load_mechanism(name):
     """Lädt einen gespeicherten Mechanismus und stellt sicher, dass fixierte Gelenke übernommen werden."""
-    config = Query()
-    result = db.get(config.name == name)
-    
-    if result:
-        try:
-            return Mechanism(
-                fixed_point=np.array(result["fixed_point"]),
-                radius=result["radius"],
-                start_angle=result["theta"],
-                speed=result["speed"],
-                joints={int(k): np.array(v) for k, v in result["joints"].items()},
-                fixed_joints=set(result.get("fixed_joints", [])),  
-                rods=[tuple(pair) for pair in result["rods"]]
-            )
-        except Exception as e:
-            st.sidebar.error(f"Fehler beim Laden des Mechanismus: {e}")
-            return None
-    else:
-        st.sidebar.error("⚠ Mechanismus nicht gefunden.")
-        return None
+    result = load_config(name)
+    try:
+        return Mechanism(
+            fixed_point=np.array(result["fixed_point"]),
+            radius=result["radius"],
+            start_angle=result["theta"],
+            speed=result["speed"],
+            joints={int(k): np.array(v) for k, v in result["joints"].items()},
+            fixed_joints=set(result.get("fixed_joints", [])),
+            rods=[tuple(pair) for pair in result["rods"]]
+        )
+    except Exception as e:
+        raise StorageError(f"Fehler beim Laden des Mechanismus: {e}") from e
 
 def get_all_mechanism_names():
     """Gibt eine Liste aller gespeicherten Mechanismen zurück."""
-    return [entry["name"] for entry in db.all()]
+    return [name for (name,) in _connect().execute("SELECT name FROM mechanisms ORDER BY rowid")]
 
 def delete_mechanism(name):
     """Löscht einen gespeicherten Mechanismus aus der Datenbank."""
-    if name:
-        config = Query()
-        if db.remove(config.name == name):
-            st.sidebar.success(f"🗑 Mechanismus '{name}' gelöscht!")
-        else:
-            st.sidebar.error("⚠ Mechanismus nicht gefunden.")
-    else:
-        st.sidebar.error("⚠ Bitte einen gültigen Namen zum Löschen eingeben.")
+    if not name:
+        raise StorageError("⚠ Bitte einen gültigen Namen zum Löschen eingeben.")
+    conn = _connect()
+    with conn:
+        deleted = conn.execute("DELETE FROM mechanisms WHERE name = ?", (name,)).rowcount
+    if not deleted:
+        raise StorageError(f"⚠ Mechanismus '{name}' nicht gefunden.")
@@ -0,0 +1,218 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import storage
+from collision import first_interference
+from mechanism import Mechanism
+
+
+def load_config(path, name=None):
+    """ Liest eine Mechanismus-Konfiguration aus einer JSON-Datei.
+
+    Akzeptiert einen einzelnen Datensatz im Format von storage.py oder eine alte
+    TinyDB-Datei; dann wird der Eintrag mit dem angegebenen Namen gewählt. Mechanismen
+    aus der SQLite-Datenbank liefert storage.load_config.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "_default" in data:
+        entries = list(data["_default"].values())
+        matches = [entry for entry in entries if entry.get("name") == name] if name else entries[:1]
+        if not matches:
+            raise ValueError(f"Mechanismus '{name}' nicht in {path} gefunden.")
+        return matches[0]
+    return data
+
+
+def _is_sqlite(path):
+    with open(path, "rb") as f:
+        return f.read(16) == b"SQLite format 3\0"
+
+
+def build_variant(config, params):
+    """ Erzeugt einen Mechanismus aus der Konfiguration mit überschriebenen Parametern.
+
+    Unterstützt radius, fixed_x, fixed_y, joint_<j>_x, joint_<j>_y und
+    rod_<j1>_<j2> (Stablänge). Gelenk 1 und 2 werden wie in main.py aus
+    Mittelpunkt, Radius und Startwinkel gesetzt.
+    """
+    fixed_point = np.array(config["fixed_point"], dtype=float)
+    fixed_point = np.array([params.get("fixed_x", fixed_point[0]), params.get("fixed_y", fixed_point[1])])
+    radius = params.get("radius", config["radius"])
+    start_angle = config["theta"]
+    joints = {int(k): np.array(v, dtype=float) for k, v in config["joints"].items()}
+    rods = [tuple(pair) for pair in config["rods"]]
+
+    rod_lengths = {}
+    for name, value in params.items():
+        parts = name.split("_")
+        if name in ("radius", "fixed_x", "fixed_y"):
+            continue
+        elif parts[0] == "joint" and len(parts) == 3 and parts[2] in ("x", "y"):
+            joints[int(parts[1])][0 if parts[2] == "x" else 1] = value
+        elif parts[0] == "rod" and len(parts) == 3:
+            rod_lengths[tuple(sorted((int(parts[1]), int(parts[2]))))] = value
+        else:
+            raise ValueError(f"Unbekannter Parameter: {name}")
+
+    joints[1] = fixed_point
+    joints[2] = fixed_point + radius * np.array([np.cos(np.radians(start_angle)), np.sin(np.radians(start_angle))])
+    mechanism = Mechanism(fixed_point, radius, start_angle, config["speed"], joints, config.get("fixed_joints", []), rods)
+
+    if rod_lengths:
+        for pair, length in rod_lengths.items():
+            # rod_4_2 und rod_2_4 meinen denselben Stab, egal in welcher Richtung er gespeichert ist
+            rows = [i for i, rod in enumerate(mechanism.rods) if tuple(sorted(rod)) == pair]
+            if not rows:
+                raise ValueError(f"Stab {pair[0]}-{pair[1]} existiert nicht.")
+            mechanism.rod_lengths[rows] = length
+        mechanism.compile_topology()
+    return mechanism
+
+
+def foot_path_metrics(path):
+    """ Kennzahlen einer Fußbahn: Schrittlänge, Schritthöhe und Ebenheit der unteren Hälfte. """
+    path = path[~np.isnan(path).any(axis=1)]
+    if len(path) < 2:
+        return {"stride_length": np.nan, "step_height": np.nan, "flatness": np.nan}
+    lowest = np.sort(path[:, 1])[: max(len(path) // 2, 1)]
+    return {
+        "stride_length": float(np.ptp(path[:, 0])),
+        "step_height": float(np.ptp(path[:, 1])),
+        "flatness": float(np.std(lowest)),
+    }
+
+
+def evaluate_variant(config, params, steps=180, foot_joint=None, clearance=None):
+    """ Löst eine Kurbelumdrehung für eine Variante und gibt ihre Kennzahlen als Zeile zurück.
+
+    Mit clearance wird zusätzlich geprüft, ob sich Stäbe irgendwo im Zyklus kreuzen oder
+    näher als clearance kommen (interference_free, first_interference_angle in Grad).
+    """
+    row = dict(params)
+    try:
+        mechanism = build_variant(config, params)
+        mechanism.verbose = False
+        positions, residuals, failures = mechanism.solve_cycle(steps)
+    except (ValueError, KeyError, np.linalg.LinAlgError):
+        row.update({"solvable": 0.0, "max_residual": np.nan, "stride_length": np.nan, "step_height": np.nan, "flatness": np.nan})
+        if clearance is not None:
+            row.update({"interference_free": np.nan, "first_interference_angle": np.nan})
+        return row
+
+    if clearance is not None:
+        frame = first_interference(positions, mechanism.rod_index, failures, clearance)
+        row["interference_free"] = float(frame is None)
+        row["first_interference_angle"] = np.nan if frame is None else float(np.degrees(mechanism.cycle_angles(steps)[frame]) % 360.0)
+
+    foot = max(mechanism.joint_ids) if foot_joint is None else foot_joint
+    row["solvable"] = float(1.0 - failures.mean())
+    row["max_residual"] = float(np.nanmax(residuals)) if not failures.all() else np.nan
+    row.update(foot_path_metrics(positions[:, mechanism.joint_ids.index(foot)]))
+    return row
+
+
+def _evaluate_chunk(config, chunk, steps, foot_joint, clearance=None, reject_interference=False):
+    rows = [dict(evaluate_variant(config, params, steps, foot_joint, clearance), variant=index) for index, params in chunk]
+    if reject_interference:
+        # Varianten mit kollidierenden Stäben werden gar nicht erst geschrieben
+        rows = [row for row in rows if row.get("interference_free") != 0.0]
+    return rows
+
+
+def parameter_grid(ranges):
+    """ Bildet das kartesische Produkt aller Parameterbereiche als Liste von Dicts. """
+    names = list(ranges)
+    return [dict(zip(names, map(float, values))) for values in itertools.product(*(ranges[n] for n in names))]
+
+
+def run_sweep(config, ranges, output, steps=180, foot_joint=None, workers=None, chunk_size=64,
+              clearance=None, reject_interference=False):
+    """ Bewertet alle Varianten parallel und schreibt die Ergebnisse fortlaufend als Parquet-Datei.
+
+    Mit clearance wird jede Variante auf kollidierende Stäbe geprüft; mit reject_interference
+    werden solche Varianten verworfen. Gibt die Anzahl der geschriebenen Varianten zurück.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    variants = list(enumerate(parameter_grid(ranges)))
+    if variants:
+        # Ungültige Parameternamen früh melden statt in jedem Prozess
+        build_variant(config, variants[0][1])
+    chunks = [variants[i:i + chunk_size] for i in range(0, len(variants), chunk_size)]
+
+    # Feste Spaltenfolge: gleich für alle Blöcke, und auch ohne übrige Variante entsteht eine (leere) Datei
+    columns = list(ranges) + ["solvable", "max_residual", "stride_length", "step_height", "flatness"]
+    if clearance is not None:
+        columns += ["interference_free", "first_interference_angle"]
+    schema = pa.schema([(name, pa.float64()) for name in columns] + [("variant", pa.int64())])
+
+    written = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(_evaluate_chunk, config, chunk, steps, foot_joint, clearance, reject_interference)
+                       for chunk in chunks]
+            for future in as_completed(futures):
+                rows = future.result()
+                if rows:
+                    writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                    written += len(rows)
+    return written
+
+
+def parse_range(text):
+    """ Wandelt 'name=start:stop:anzahl' oder 'name=a,b,c' in (name, Werte) um. """
+    name, _, spec = text.partition("=")
+    if not spec:
+        raise argparse.ArgumentTypeError(f"Ungültiger Parameterbereich: {text}")
+    if ":" in spec:
+        start, stop, num = spec.split(":")
+        return name, np.linspace(float(start), float(stop), int(num))
+    return name, [float(v) for v in spec.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parameterstudie für einen gespeicherten Mechanismus")
+    parser.add_argument("config", nargs="?", help="JSON-Datei mit einer Mechanismus-Konfiguration oder eine alte TinyDB-Datei")
+    parser.add_argument("--name", help="Name des gespeicherten Mechanismus (ohne config aus der SQLite-Datenbank)")
+    parser.add_argument("--db", default=storage.DB_FILENAME, help="SQLite-Datenbank der Mechanismen")
+    parser.add_argument("--param", action="append", type=parse_range, default=[],
+                        help="Parameterbereich, z.B. radius=10:20:11 oder joint_4_x=-40,-35,-30")
+    parser.add_argument("--output", default="sweep_results.parquet", help="Ausgabedatei (Parquet)")
+    parser.add_argument("--steps", type=int, default=180, help="Frames pro Kurbelumdrehung")
+    parser.add_argument("--foot", type=int, help="Gelenk, dessen Bahn bewertet wird (Standard: höchste Gelenknummer)")
+    parser.add_argument("--workers", type=int, help="Anzahl der Prozesse (Standard: alle Kerne)")
+    parser.add_argument("--clearance", type=float, help="Stäbe auf Kreuzungen und Mindestabstand (mm) prüfen")
+    parser.add_argument("--reject-interference", action="store_true", help="Varianten mit kollidierenden Stäben verwerfen")
+    args = parser.parse_args(argv)
+
+    if args.config and _is_sqlite(args.config):
+        args.db, args.config = args.config, None
+    try:
+        if args.config:
+            config = load_config(args.config, args.name)
+        elif args.name:
+            storage.DB_FILENAME = args.db
+            config = storage.load_config(args.name)
+        else:
+            parser.error("Konfigurationsdatei oder --name angeben.")
+    except storage.StorageError as e:
+        print(e, file=sys.stderr)
+        return 1
+    ranges = dict(args.param)
+    if args.reject_interference and args.clearance is None:
+        args.clearance = 0.0
+    count = run_sweep(config, ranges, args.output, steps=args.steps, foot_joint=args.foot, workers=args.workers,
+                      clearance=args.clearance, reject_interference=args.reject_interference)
+    print(f"{count} Varianten in {args.output} geschrieben")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
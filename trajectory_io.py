@@ -0,0 +1,75 @@
+import struct
+import numpy as np
+
+MAGIC = b"MTRJ"
+VERSION = 1
+DTYPES = {0: np.float64, 1: np.float32}
+# Magic, Version, Dtype-Code, Frames, Gelenke, Mechanismus-Hash (SHA-256 als Hex)
+HEADER = struct.Struct("<4sHBxII64s")
+ALIGNMENT = 64
+
+
+def _data_offset(num_joints):
+    size = HEADER.size + 4 * num_joints
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def write_trajectory(filename, positions, joint_ids, mechanism_hash="", dtype=np.float64):
+    """ Schreibt ein (Frames x Gelenke x 2)-Array als Binärdatei.
+
+    Auf den Header folgen die Gelenk-IDs als int32 und, auf 64 Byte ausgerichtet,
+    der zusammenhängende Datenblock in float64 oder float32.
+    """
+    positions = np.asarray(positions)
+    code = {np.dtype(v): k for k, v in DTYPES.items()}[np.dtype(dtype)]
+    frames, joints = positions.shape[:2]
+    header = HEADER.pack(MAGIC, VERSION, code, frames, joints, mechanism_hash.encode("ascii"))
+    ids = np.asarray(joint_ids, dtype="<i4").tobytes()
+    with open(filename, "wb") as f:
+        f.write(header + ids)
+        f.write(b"\0" * (_data_offset(joints) - len(header) - len(ids)))
+        f.write(np.ascontiguousarray(positions, dtype=np.dtype(dtype).newbyteorder("<")).tobytes())
+    return filename
+
+
+def read_trajectory(filename, mode="r"):
+    """ Öffnet eine Binärdatei ohne Kopie. Gibt (positions als np.memmap, joint_ids, mechanism_hash) zurück. """
+    with open(filename, "rb") as f:
+        magic, version, code, frames, joints, mechanism_hash = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} ist keine Bahnkurvendatei (Version {VERSION}).")
+        joint_ids = np.frombuffer(f.read(4 * joints), dtype="<i4").tolist()
+    dtype = np.dtype(DTYPES[code]).newbyteorder("<")
+    positions = np.memmap(filename, dtype=dtype, mode=mode, offset=_data_offset(joints), shape=(frames, joints, 2))
+    return positions, joint_ids, mechanism_hash.rstrip(b"\0").decode("ascii")
+
+
+def write_trajectory_csv(filename, positions, joint_ids, velocities=None, accelerations=None):
+    """ Schreibt ein (Frames x Gelenke x 2)-Array als CSV mit einer Spalte pro Koordinate.
+
+    Optional werden Geschwindigkeiten und Beschleunigungen gleicher Form als Spalten
+    VX/VY bzw. AX/AY je Gelenk mitgeschrieben. Fehlende Werte (NaN) bleiben leer.
+    """
+    blocks, axes = [np.asarray(positions)], ["X", "Y"]
+    if velocities is not None:
+        blocks.append(np.asarray(velocities))
+        axes += ["VX", "VY"]
+    if accelerations is not None:
+        blocks.append(np.asarray(accelerations))
+        axes += ["AX", "AY"]
+
+    frames = len(positions)
+    columns = [f"Joint {j} {axis}" for j in joint_ids for axis in axes]
+    # Gelenke x Koordinaten liegen nach dem Zusammenfügen in Spaltenreihenfolge, reshape ist eine Sicht
+    values = np.concatenate(blocks, axis=2) if len(blocks) > 1 else blocks[0]
+    values = values.reshape(frames, len(columns))
+    table = np.empty((frames, len(columns) + 1), dtype=object)
+    table[:, 0] = range(frames)
+    table[:, 1:] = values
+    table[:, 1:][np.isnan(values)] = ""
+    # Die ganze Tabelle in einem format-Aufruf schreiben statt Zeile für Zeile
+    row = ",".join(["{}"] * (len(columns) + 1)) + "\n"
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(",".join(["Frame"] + columns) + "\n")
+        f.write((row * frames).format(*table.ravel().tolist()))
+    return filename
@@ -0,0 +1,151 @@
+import copy
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from cache import default_cache, mechanism_key
+from encoder import FrameEncoder
+from instrumentation import FrameTrace
+from simulation import render_frames, trajectory_paths
+from trajectory_io import write_trajectory, write_trajectory_csv
+
+OUTPUT_DIR = "simulation_jobs"
+MAX_JOBS = 100
+
+_pool = ThreadPoolExecutor(max_workers=max(2, (os.cpu_count() or 2) // 2), thread_name_prefix="simulation")
+_jobs = {}
+_lock = threading.Lock()
+
+
+class SimulationJob:
+    """ Zustand eines Simulationsauftrags, der im Hintergrund gelöst, gezeichnet und kodiert wird. """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = "wartend"
+        self.progress = 0.0
+        # (Frame, Bild) des zuletzt gezeichneten Frames für die Vorschau
+        self.preview = None
+        self.trajectory = None
+        self.video_filename = None
+        self.csv_filename = None
+        self.binary_filename = None
+        # MP4 gewählt, aber mangels H.264-Encoder als GIF geschrieben
+        self.video_fallback = False
+        self.trace = FrameTrace()
+        self.trace_filenames = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        # Zwischendateien in OUTPUT_DIR; fertige Ergebnisse liegen im Cache und werden dort verwaltet
+        self.output_files = []
+
+    @property
+    def done(self):
+        return self.status in ("fertig", "abgebrochen", "fehler")
+
+
+def submit_simulation(mechanism, plot_size_x=100, plot_size_y=100, video_format="gif", frame_step=1, omega=2 * np.pi, adaptive=False):
+    """ Reiht eine Simulation in den Worker-Pool ein und gibt die Job-ID zurück. omega ist die Kurbeldrehzahl in rad/s. """
+    job = SimulationJob(uuid.uuid4().hex[:12])
+    with _lock:
+        _forget_finished_jobs()
+        _jobs[job.job_id] = job
+    # Kopie, damit spätere Änderungen der Sitzung den laufenden Job nicht beeinflussen
+    _pool.submit(_run_job, job, copy.deepcopy(mechanism), plot_size_x, plot_size_y, video_format, frame_step, omega, adaptive)
+    return job.job_id
+
+
+def get_job(job_id):
+    """ Gibt den Job zur ID zurück oder None, falls er unbekannt ist. """
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def cancel_job(job_id):
+    """ Fordert den Abbruch eines Jobs an. Er stoppt vor dem nächsten Frame. """
+    job = get_job(job_id)
+    if job is not None:
+        job.cancel_event.set()
+
+
+def _forget_finished_jobs():
+    finished = [job_id for job_id, job in _jobs.items() if job.done]
+    for job_id in finished[:max(len(_jobs) - MAX_JOBS + 1, 0)]:
+        job = _jobs.pop(job_id)
+        for filename in job.output_files:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+
+def _run_job(job, mechanism, plot_size_x, plot_size_y, video_format, frame_step, omega, adaptive):
+    try:
+        job.status = "läuft"
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        positions, residuals, failures = default_cache.solve_cycle(mechanism, trace=job.trace, adaptive=adaptive)
+        traced, paths = trajectory_paths(mechanism, positions, failures)
+        job.trajectory = {mechanism.joint_ids[k]: paths[:, i] for i, k in enumerate(traced)}
+
+        # Gerenderte Dateien hängen zusätzlich von Darstellung und markierten Bahnkurven ab
+        render_key = mechanism_key(
+            mechanism, plot_size=[plot_size_x, plot_size_y], video_format=video_format,
+            frame_step=frame_step, traced=[mechanism.joint_ids[k] for k in traced], omega=omega,
+            adaptive=adaptive
+        )
+        video_name = f"simulation.{video_format}"
+        # Ohne H.264-Encoder liegt statt des MP4 ein GIF im Cache
+        job.video_filename = default_cache.artifact_path(render_key, video_name) or default_cache.artifact_path(render_key, "simulation.gif")
+        job.csv_filename = default_cache.artifact_path(render_key, "trajectory.csv")
+        job.binary_filename = default_cache.artifact_path(render_key, "trajectory.mtrj")
+        job.video_fallback = job.video_filename is not None and not job.video_filename.endswith(video_name)
+
+        if job.video_filename is None:
+            video_filename = os.path.join(OUTPUT_DIR, f"mechanism_simulation_{job.job_id}.{video_format}")
+            # Abgebrochene Videos und das GIF, das ohne H.264-Encoder statt des MP4 entsteht
+            job.output_files += [video_filename, os.path.splitext(video_filename)[0] + ".gif"]
+            solved_frames = np.flatnonzero(~failures)
+            frames = render_frames(mechanism, positions, failures, plot_size_x, plot_size_y)
+
+            with FrameEncoder(video_filename, fps=20, frame_step=frame_step) as encoder:
+                for count, frame in enumerate(solved_frames, start=1):
+                    if job.cancel_event.is_set():
+                        job.status = "abgebrochen"
+                        return
+                    with job.trace.timed(frame, "draw"):
+                        buf = next(frames)
+                    job.preview = (frame, buf.copy())
+                    job.progress = count / len(solved_frames)
+                    with job.trace.timed(frame, "encode"):
+                        encoder.append(buf)
+
+            if encoder.written:
+                job.video_fallback = encoder.fallback
+                job.video_filename = default_cache.store_artifact(render_key, f"simulation.{encoder.format}", encoder.filename)
+
+        job.output_files += [os.path.join(OUTPUT_DIR, f"mechanism_trajectory_{job.job_id}.{ext}") for ext in ("csv", "mtrj")]
+        job.output_files += [os.path.join(OUTPUT_DIR, f"trace_{job.job_id}.{ext}") for ext in ("json", "csv")]
+        if job.csv_filename is None and job.trajectory and len(paths):
+            velocities, accelerations = mechanism.cycle_derivatives(positions, omega)
+            csv_filename = write_trajectory_csv(
+                os.path.join(OUTPUT_DIR, f"mechanism_trajectory_{job.job_id}.csv"), paths, list(job.trajectory),
+                velocities[~failures][:, traced], accelerations[~failures][:, traced]
+            )
+            job.csv_filename = default_cache.store_artifact(render_key, "trajectory.csv", csv_filename)
+        if job.binary_filename is None:
+            binary_filename = write_trajectory(
+                os.path.join(OUTPUT_DIR, f"mechanism_trajectory_{job.job_id}.mtrj"), positions,
+                mechanism.joint_ids, mechanism_hash=mechanism_key(mechanism, adaptive=adaptive)
+            )
+            job.binary_filename = default_cache.store_artifact(render_key, "trajectory.mtrj", binary_filename)
+        job.trace_filenames = (
+            job.trace.to_json(os.path.join(OUTPUT_DIR, f"trace_{job.job_id}.json")),
+            job.trace.to_csv(os.path.join(OUTPUT_DIR, f"trace_{job.job_id}.csv")),
+        )
+        job.progress = 1.0
+        job.status = "fertig"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "fehler"